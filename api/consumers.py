@@ -1,18 +1,25 @@
 from ocpp_lib.types import RemoteStartTransaction_Req
 from channels.generic.websocket import WebsocketConsumer, AsyncWebsocketConsumer
-from asgiref.sync import async_to_sync, sync_to_async
-import logging, json, datetime
+from asgiref.sync import async_to_sync
+import logging
 from ocpp_lib import call
-from channels.db import database_sync_to_async
+from ocpp_lib.utils import json_loads, json_dumps
 
 from ocpp_lib.enums import OCPPMessageType, OCPPCommands
 from ocpp_lib.call import Call
 from ocpp_lib.types import IdToken
 from . import models as ocpp_models
+from .writer import call_writer
 
 # Initialize the logger
 logger = logging.getLogger('ocpp')
 
+# The callback functions of the OCPP actions which the central system can handle
+# and the OCPP message types keyed by their value. These are built once so that
+# each received message only needs a dictionary lookup to find them
+_ACTION_HANDLERS = {name: getattr(Call.Callbacks, name) for name in OCPPCommands.__members__ if hasattr(Call.Callbacks, name)}
+_MESSAGE_TYPES = OCPPMessageType._value2member_map_
+
 class OcppConsumer(AsyncWebsocketConsumer):
     '''
     An OCPP consumer used to implement the OCPP 1.6J standard over websockets
@@ -23,39 +30,21 @@ class OcppConsumer(AsyncWebsocketConsumer):
     any consumer needs.
     '''
 
-    @database_sync_to_async
-    def save_and_link_call_and_result(self, call_obj:ocpp_models.Call, call_result_obj:ocpp_models.CallResult) -> None:
-        '''
-        Saves the call and call result using async techniques.
-
-        ## Description
-        This method is created to take in a call and call result and save them.
-        it will also perform the linkage needed for them.
-
-        ## Parameters
-        - `call_obj` (Call): The call object obtained from the models
-        - `call_result_obj` (CallResult): The call result object obtained from the models
-        '''
-        # Saving them
-        call_obj.save()
-        call_result_obj.save()
-
-        # Creating the linkage
-        call_obj.call_result_obj = call_result_obj
-        call_result_obj.call_obj = call_obj
-        
-        # Saving them
-        call_obj.save()
-        call_result_obj.save()
-
     async def connect(self):
         # Getting the charger ID from the URL that the charger 
         # visited
         self.charger_id = self.scope['url_route']['kwargs']['charger_id']
         self.charger_group = f'ocpp_{self.charger_id}'
 
+        # The handlers of the OCPP message types which the charger can send
+        self._dispatch = {
+            OCPPMessageType.CALL: self._handle_call,
+            OCPPMessageType.CALL_RESULT: self._handle_call_result,
+            OCPPMessageType.CALL_ERROR: self._handle_call_error,
+        }
+
         # Logging the visit
-        logger.info(f"Charger with ID '{self.charger_id}' connected")
+        logger.info("Charger with ID '%s' connected", self.charger_id)
 
         # Making this charger join the room group
         await self.channel_layer.group_add(
@@ -63,12 +52,23 @@ class OcppConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
+        # Letting the call handler send calls to this consumer's channel directly
+        Call.CallHandler._charger_channels[self.charger_id] = self.channel_name
+
+        # The calls and call results of the server are saved in the background
+        call_writer.serve()
+
         # Accept the connection
         await self.accept()
 
     async def disconnect(self, close_code):
         # Logging the exit
-        logger.info(f"Charger with ID '{self.charger_id}' disconnected")
+        logger.info("Charger with ID '%s' disconnected", self.charger_id)
+
+        # Removing this consumer's channel unless the charger has already reconnected
+        # with a new consumer
+        if Call.CallHandler._charger_channels.get(self.charger_id) == self.channel_name:
+            del Call.CallHandler._charger_channels[self.charger_id]
 
         # Leave room group
         await self.channel_layer.group_discard(
@@ -77,117 +77,172 @@ class OcppConsumer(AsyncWebsocketConsumer):
         )
 
     # Receive message from WebSocket
-    async def receive(self, text_data):
-        # Deserializing the message sent.
-        message = json.loads(text_data)
-        logger.info(f"Received a message from '{self.charger_id}' of: {message}")
+    async def receive(self, text_data = None, bytes_data = None):
+        # Deserializing the message sent. Chargers may send the message as a
+        # binary frame, in which case we parse the bytes directly. The raw frame
+        # is what gets logged so the message is not turned back into text
+        frame = text_data if text_data is not None else bytes_data
+        logger.info("Received a message from '%s' of: %s", self.charger_id, frame)
+
+        # Frames which are not valid JSON arrays are not OCPP messages, so they're
+        # logged and ignored instead of closing the connection
+        try:
+            message = json_loads(frame)
+        except ValueError:
+            logger.critical("Charger '%s' sent a message which is not valid JSON: %s", self.charger_id, frame)
+            return
+
+        if not isinstance(message, list) or not message:
+            logger.critical("Charger '%s' sent a message which is not an OCPP message: %s", self.charger_id, frame)
+            return
 
         # # Getting the message type id
         try:
-            message_type_id = OCPPMessageType(message[0])
-        except:
-            logger.critical(f"Charger '{self.charger_id}' sent an unknown OCPP message type of {message[0]}")
-
-        # Different action depending on the message tyep
-        if message_type_id == OCPPMessageType.CALL:
-            logger.info(f"Charger '{self.charger_id}' sent a Call message")
-            
-            # Loading the sent values
-            message_id, action, payload = message[1], message[2], message[3]
-
-            # Checking if the action sent is a valid OCPP action
-            try:
-                action = OCPPCommands[action]
-            except:
-                logger.critical(f"Charger '{self.charger_id}' sent a Call message with an invalid OCPP action of '{action}'")
-                return
-
-            # Performing the callback function for this action
-            try:
-                response = getattr(Call.Callbacks, action.name)(
-                    message_id = message_id,
-                    call_payload = payload
-                )
-                logger.info(f"For the message with the id '{message_id}' and action '{action.name}' created the response: {response}")
-            except AttributeError:
-                logger.warning(f"Charger '{self.charger_id}' sent an action of '{action.name}' which the server could not handle")
-            except:
-                logger.exception(f"Charger '{self.charger_id}' sent an action of '{action.name}' which the server could not handle")
-            else:
-                # Sending the created response back
-                await self.channel_layer.group_send(
-                    self.charger_group,
-                    {
-                        'type': 'send_ocpp_message',
-                        'message': json.dumps(response)
-                    }
-                )
-
-                # Saving the call recieved and the call result created
-                logger.info(f"Creating the linkage for the message of the ID: {message_id} sent by charger '{self.charger_id}'")
-                
-                call_obj = ocpp_models.Call(
-                    message_type_id = message_type_id.value,
-                    message_id = message_id,
-                    action = action.name,
-                    payload = payload,
-
-                    charger_id = self.charger_id,
-                    sent_at = datetime.datetime.utcnow(),
-                    direction = 'C2S',
-                )
-
-                call_result_obj = ocpp_models.CallResult(
-                    message_type_id = response[0],
-                    message_id = response[1],
-                    payload = response[2],
-
-                    charger_id = self.charger_id,
-                    sent_at = datetime.datetime.utcnow(),
-                    direction = 'S2C',
-                )
-
-                await self.save_and_link_call_and_result(call_obj, call_result_obj)
-
-        elif message_type_id == OCPPMessageType.CALL_RESULT:
-            logger.info(f"Charger '{self.charger_id}' sent a Call Result message")
-
-            # Deserializing the call result message
-            message_id, payload = message[1:]
-
-            # All we do here is perform the linkage between the call and the call result.
-            call_obj = await sync_to_async(ocpp_models.Call.objects.filter)(message_id = message_id)
-
-            # If we were able to find a call object with the same message_id then
-            # everything is okay
-            if await sync_to_async(len)(call_obj) > 0:
-                call_obj = call_obj[0]
-
-                call_result_obj = ocpp_models.CallResult(
-                    message_type_id = message_type_id.value,
-                    message_id = message_id,
-                    payload = payload,
-
-                    charger_id = self.charger_id,
-                    sent_at = datetime.datetime.utcnow(),
-                    direction = 'C2S',
-
-                    call_obj = call_obj
-                )
-
-                await self.save_and_link_call_and_result(call_obj, call_result_obj)
-
-            # In this case we were either not able to find the message with the matching
-            # id or we found multiple messages with a matching ID which is a problem
+            message_type_id = _MESSAGE_TYPES.get(message[0])
+        except TypeError:
+            message_type_id = None
+        if message_type_id is None:
+            logger.critical("Charger '%s' sent an unknown OCPP message type of %s", self.charger_id, message[0])
+            return
+
+        # Handling the message using the handler of its message type
+        await self._dispatch[message_type_id](message)
+
+    async def _handle_call(self, message:list) -> None:
+        '''
+        Handles a Call message sent by the charger
+
+        ## Description
+        Performs the callback function of the action in the call, sends the call result
+        created by it back to the charger and then saves the call and call result.
+
+        ## Parameters
+        - `message` (list): The deserialized OCPP message sent by the charger
+        '''
+        logger.info("Charger '%s' sent a Call message", self.charger_id)
+        
+        # Loading the sent values. A call must have exactly four elements
+        try:
+            _, message_id, action, payload = message
+        except ValueError:
+            logger.critical("Charger '%s' sent a malformed Call message of: %s", self.charger_id, message)
+            return
+
+        # The message id and the action must be strings, anything else could not be
+        # looked up or saved
+        if not isinstance(message_id, str) or not isinstance(action, str):
+            logger.critical("Charger '%s' sent a Call message with an invalid message id or OCPP action of: %s", self.charger_id, message)
+            return
+
+        # Getting the callback function for this action. If there is none then
+        # the action is either not a valid OCPP action or one we can't handle
+        handler = _ACTION_HANDLERS.get(action)
+        if handler is None:
+            if action in OCPPCommands.__members__:
+                logger.warning("Charger '%s' sent an action of '%s' which the server could not handle", self.charger_id, action)
             else:
-                logger.critical(f"Attempted to find a call message with the message id of '{message_id}' but was not able to find any. Number of search results {len(call_obj)}")
+                logger.critical("Charger '%s' sent a Call message with an invalid OCPP action of '%s'", self.charger_id, action)
+            return
+
+        # Performing the callback function for this action
+        try:
+            response = handler(message_id, payload)
+
+            # Serializing the response once. The same string is logged and
+            # sent to the charger
+            serialized_response = json_dumps(response)
+            logger.info("For the message with the id '%s' and action '%s' created the response: %s", message_id, action, serialized_response)
+        except Exception:
+            logger.exception("Charger '%s' sent an action of '%s' which the server could not handle", self.charger_id, action)
+            return
+
+        # Sending the created response back. The response is only meant for the
+        # charger on this connection, so it is sent directly instead of going
+        # through the channel layer group
+        await self.send(text_data = serialized_response)
+
+        # Saving the call received and the call result created
+        logger.info("Creating the linkage for the message of the ID: %s sent by charger '%s'", message_id, self.charger_id)
+        
+        call_obj = ocpp_models.Call(
+            message_type_id = OCPPMessageType.CALL.value,
+            message_id = message_id,
+            action = action,
+            payload = payload,
+
+            charger_id = self.charger_id,
+            direction = 'C2S',
+        )
+
+        call_result_obj = ocpp_models.CallResult(
+            message_type_id = response[0],
+            message_id = response[1],
+            payload = response[2],
+
+            charger_id = self.charger_id,
+            direction = 'S2C',
+        )
+
+        # The pair is saved in the background together with the other
+        # messages received around the same time
+        call_writer.enqueue(call_obj, call_result_obj)
+
+    async def _handle_call_result(self, message:list) -> None:
+        '''
+        Handles a Call Result message sent by the charger
 
-        elif message_type_id == OCPPMessageType.CALL_ERROR:
-            logger.info(f"Charger '{self.charger_id}' sent a Call Error message")
+        ## Description
+        Saves the call result and links it to the call with the same message id which
+        the central system sent to the charger.
+
+        ## Parameters
+        - `message` (list): The deserialized OCPP message sent by the charger
+        '''
+        logger.info("Charger '%s' sent a Call Result message", self.charger_id)
+
+        # Deserializing the call result message. A call result must have exactly
+        # three elements
+        try:
+            _, message_id, payload = message
+        except ValueError:
+            logger.critical("Charger '%s' sent a malformed Call Result message of: %s", self.charger_id, message)
+            return
+
+        # The message id must be a string, anything else could not be matched to a call
+        if not isinstance(message_id, str):
+            logger.critical("Charger '%s' sent a Call Result message with an invalid message id of: %s", self.charger_id, message)
+            return
+
+        # Handing the call result to the call awaiting it if it was issued by this process
+        Call.CallHandler.resolve_response(self.charger_id, message_id, (OCPPMessageType.CALL_RESULT.value, message_id, payload))
+
+        # Saving the call result in the background. It is linked to its call, which has
+        # been queued before it, when they're saved
+        call_result_obj = ocpp_models.CallResult(
+            message_type_id = OCPPMessageType.CALL_RESULT.value,
+            message_id = message_id,
+            payload = payload,
+
+            charger_id = self.charger_id,
+            direction = 'C2S',
+        )
+        call_writer.enqueue(call_result_obj = call_result_obj)
+
+    async def _handle_call_error(self, message:list) -> None:
+        '''
+        Handles a Call Error message sent by the charger
+
+        ## Parameters
+        - `message` (list): The deserialized OCPP message sent by the charger
+        '''
+        logger.info("Charger '%s' sent a Call Error message", self.charger_id)
 
     # Method used to send OCPP messages to the group
     async def send_ocpp_message(self, event):
-        await self.send(text_data = event['message'])
+        # OCPP-J messages are always sent to the charger as text frames, even
+        # if the producer of the event stored the message as bytes
+        message = event['message']
+        await self.send(text_data = message if isinstance(message, str) else message.decode())
 
 
 class ExternalCommandsConsumer(AsyncWebsocketConsumer):
@@ -208,7 +263,7 @@ class ExternalCommandsConsumer(AsyncWebsocketConsumer):
         self.external_commands_group = f'externalCommands_{self.charger_id}'
 
         # Logging the visit
-        logger.info(f"External Commands for charger with ID '{self.charger_id}' connected")
+        logger.info("External Commands for charger with ID '%s' connected", self.charger_id)
 
         # Making this charger join the room group
         await self.channel_layer.group_add(
@@ -221,7 +276,7 @@ class ExternalCommandsConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         # Logging the exit
-        logger.info(f"External Commands for charger with ID '{self.charger_id}' disconnected")
+        logger.info("External Commands for charger with ID '%s' disconnected", self.charger_id)
 
         # Leave room group
         await self.channel_layer.group_discard(
@@ -230,7 +285,8 @@ class ExternalCommandsConsumer(AsyncWebsocketConsumer):
         )
 
     # Receive message from WebSocket
-    async def receive(self, text_data):
-        # Deserializing the message sent.
-        message = json.loads(text_data)
-        logger.info(f"Recieved external command for the charger '{self.charger_id}' containing: {message}")
\ No newline at end of file
+    async def receive(self, text_data = None, bytes_data = None):
+        # Deserializing the message sent. Chargers may send the message as a
+        # binary frame, in which case we parse the bytes directly
+        message = json_loads(text_data if text_data is not None else bytes_data)
+        logger.info("Received external command for the charger '%s' containing: %s", self.charger_id, message)
\ No newline at end of file
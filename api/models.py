@@ -9,7 +9,7 @@ class Call(models.Model):
     message_type_id = models.IntegerField()
     message_id = models.CharField(max_length=36)
     action = models.CharField(max_length=70)
-    payload = models.TextField()
+    payload = models.JSONField()
 
     charger_id = models.CharField(max_length=100, default='')
     sent_at = models.DateTimeField(auto_now_add=True, blank=True)
@@ -17,6 +17,13 @@ class Call(models.Model):
 
     call_result_obj = models.OneToOneField('CallResult', on_delete=models.CASCADE, null=True)
 
+    class Meta:
+        # Message ids are only unique for a single charger, so calls are looked up
+        # by both the charger id and the message id
+        indexes = [
+            models.Index(fields=['charger_id', 'message_id']),
+        ]
+
 class CallResult(models.Model):
     direction_choices = [
         ('C2S', 'Client to Server'),
@@ -25,7 +32,7 @@ class CallResult(models.Model):
 
     message_type_id = models.IntegerField()
     message_id = models.CharField(max_length=36)
-    payload = models.TextField()
+    payload = models.JSONField()
 
     charger_id = models.CharField(max_length=100, default='')
     sent_at = models.DateTimeField(auto_now_add=True, blank=True)
@@ -33,5 +40,12 @@ class CallResult(models.Model):
 
     call_obj = models.OneToOneField('Call', on_delete=models.CASCADE, null=True)
 
+    class Meta:
+        # Message ids are only unique for a single charger, so call results are looked
+        # up by both the charger id and the message id
+        indexes = [
+            models.Index(fields=['charger_id', 'message_id']),
+        ]
+
     def __str__(self):
-        return f'({self.id}) {"Accepted" if "Accepted" in self.payload or len(self.payload) == 2 else "Rejected"}'
\ No newline at end of file
+        return f'({self.id}) {"Accepted" if not self.payload or "Accepted" in str(self.payload) else "Rejected"}'
\ No newline at end of file
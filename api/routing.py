@@ -1,7 +1,25 @@
-from django.urls import re_path
+from django.urls import path, register_converter
 from . import consumers
 
+class ChargerIdConverter():
+    '''
+    A path converter for the IDs of the chargers
+
+    ## Description
+    Matches one or more word characters, the same IDs which the routes matched
+    before, so any charger that could connect before can still connect.
+    '''
+    regex = r'\w+'
+
+    def to_python(self, value:str) -> str:
+        return value
+
+    def to_url(self, value:str) -> str:
+        return value
+
+register_converter(ChargerIdConverter, 'charger_id')
+
 websocket_urlpatterns = [
-    re_path(r'ws/ocpp/(?P<charger_id>\w+)/$', consumers.OcppConsumer.as_asgi()),
-    re_path(r'ws/external_control/(?P<charger_id>\w+)/$', consumers.ExternalCommandsConsumer.as_asgi()),
-]
\ No newline at end of file
+    path('ws/ocpp/<charger_id:charger_id>/', consumers.OcppConsumer.as_asgi()),
+    path('ws/external_control/<charger_id:charger_id>/', consumers.ExternalCommandsConsumer.as_asgi()),
+]
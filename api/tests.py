@@ -1,3 +1,375 @@
-from django.test import TestCase
+import asyncio, datetime
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
 
-# Create your tests here.
+from ocpp_lib import call
+from ocpp_lib.call import Call
+from ocpp_lib.enums import (
+    AuthorizationStatus, 
+    ChargingProfileKindType, 
+    ChargingProfilePurposeType, 
+    ChargingRateUnitType, 
+    RegistrationStatus, 
+    UpdateType
+)
+from ocpp_lib.types import (
+    AuthorizationData,
+    BootNotification_Conf,
+    ChargingProfile,
+    ChargingSchedule,
+    ChargingSchedulePeriod,
+    GetConfiguration_Req,
+    IdTagInfo,
+    IdToken,
+    OcppType,
+    RemoteStartTransaction_Req,
+    SendLocalList_Req,
+    StopTransaction_Conf,
+)
+from ocpp_lib.utils import json_dumps, json_loads
+from . import models as ocpp_models
+from .writer import CallWriter, call_writer
+from .routing import ChargerIdConverter, websocket_urlpatterns
+
+def _call(message_id:str, charger_id:str = 'CP_1', direction:str = 'S2C', payload:dict = None) -> ocpp_models.Call:
+    '''
+    Creates an unsaved call with the given message id
+    '''
+    return ocpp_models.Call(
+        message_type_id = 2,
+        message_id = message_id,
+        action = 'Heartbeat',
+        payload = payload if payload is not None else {},
+
+        charger_id = charger_id,
+        direction = direction,
+    )
+
+def _call_result(message_id:str, charger_id:str = 'CP_1', direction:str = 'C2S') -> ocpp_models.CallResult:
+    '''
+    Creates an unsaved call result with the given message id
+    '''
+    return ocpp_models.CallResult(
+        message_type_id = 3,
+        message_id = message_id,
+        payload = {},
+
+        charger_id = charger_id,
+        direction = direction,
+    )
+
+class CallWriterTests(TransactionTestCase):
+    '''
+    Tests saving and linking the calls and call results queued in the call writer
+
+    ## Description
+    The writer saves its batches in a thread of its own, so these tests commit their
+    data instead of running inside a single transaction.
+    '''
+
+    def setUp(self):
+        self.writer = CallWriter(max_batch_delay = 0)
+
+    def save(self, *pairs) -> None:
+        '''
+        Queues the given pairs in a new event loop and waits for them to be saved
+        '''
+        async def enqueue_and_flush():
+            for call_obj, call_result_obj in pairs:
+                self.writer.enqueue(call_obj, call_result_obj)
+            await self.writer.flush()
+        async_to_sync(enqueue_and_flush)()
+
+    def test_pairs_are_saved_and_linked_in_one_batch(self):
+        self.save(*[(_call(f'm-{i}', direction = 'C2S'), _call_result(f'm-{i}', direction = 'S2C')) for i in range(3)])
+
+        self.assertEqual(ocpp_models.Call.objects.count(), 3)
+        for call_obj in ocpp_models.Call.objects.all():
+            self.assertEqual(call_obj.call_result_obj.message_id, call_obj.message_id)
+            self.assertEqual(call_obj.call_result_obj.call_obj_id, call_obj.id)
+
+    def test_call_result_is_linked_to_the_call_queued_before_it(self):
+        self.save((_call('m-1'), None), (None, _call_result('m-1')))
+
+        call_obj = ocpp_models.Call.objects.get(message_id = 'm-1')
+        self.assertEqual(call_obj.call_result_obj.call_obj_id, call_obj.id)
+
+    def test_call_result_is_linked_to_a_call_saved_after_it(self):
+        with self.assertLogs('ocpp', 'WARNING'):
+            self.save((None, _call_result('m-1')))
+        self.assertIsNone(ocpp_models.CallResult.objects.get(message_id = 'm-1').call_obj_id)
+
+        self.save((_call('m-1'), None))
+        call_obj = ocpp_models.Call.objects.get(message_id = 'm-1')
+        self.assertIsNotNone(call_obj.call_result_obj_id)
+        self.assertEqual(call_obj.call_result_obj.call_obj_id, call_obj.id)
+
+    def test_duplicate_call_results_are_ignored(self):
+        self.save((_call('m-1'), None))
+        with self.assertLogs('ocpp', 'WARNING'):
+            self.save(
+                (None, _call_result('m-1')),
+                (None, _call_result('m-1')),
+                (_call('m-2', 'CP_2', 'C2S'), _call_result('m-2', 'CP_2', 'S2C')),
+            )
+            self.save((None, _call_result('m-1')))
+
+        self.assertEqual(ocpp_models.CallResult.objects.filter(message_id = 'm-1').count(), 1)
+        self.assertIsNotNone(ocpp_models.Call.objects.get(message_id = 'm-1').call_result_obj_id)
+        self.assertIsNotNone(ocpp_models.Call.objects.get(message_id = 'm-2').call_result_obj_id)
+
+    def test_failed_batch_is_saved_one_by_one(self):
+        # The payload of the first call can not be saved, which fails the whole batch
+        with self.assertLogs('ocpp', 'ERROR'):
+            self.save(
+                (_call('m-1', payload = {'bad': object()}), None),
+                (_call('m-2', direction = 'C2S'), _call_result('m-2', direction = 'S2C')),
+            )
+
+        self.assertFalse(ocpp_models.Call.objects.filter(message_id = 'm-1').exists())
+        self.assertIsNotNone(ocpp_models.Call.objects.get(message_id = 'm-2').call_result_obj_id)
+
+    def test_queued_pairs_are_saved_when_the_event_loop_closes(self):
+        async def enqueue():
+            self.writer.enqueue(_call('m-1'))
+        async_to_sync(enqueue)()
+
+        self.assertTrue(ocpp_models.Call.objects.filter(message_id = 'm-1').exists())
+
+class ChargerIdConverterTests(SimpleTestCase):
+    '''
+    Tests matching the charger ids in the websocket routes
+    '''
+
+    def resolve(self, path:str):
+        for pattern in websocket_urlpatterns:
+            match = pattern.resolve(path)
+            if match is not None:
+                return match
+        return None
+
+    def test_charger_ids_of_word_characters_are_matched(self):
+        for charger_id in ('CP_1', 'ESP32_Charger', '1'):
+            match = self.resolve(f'ws/ocpp/{charger_id}/')
+            self.assertIsNotNone(match)
+            self.assertEqual(match.kwargs, {'charger_id': charger_id})
+
+        match = self.resolve('ws/external_control/CP_1/')
+        self.assertEqual(match.kwargs, {'charger_id': 'CP_1'})
+
+    def test_other_charger_ids_are_not_matched(self):
+        for charger_id in ('', 'CP-1', 'CP 1', 'CP/1'):
+            self.assertIsNone(self.resolve(f'ws/ocpp/{charger_id}/'))
+
+    def test_charger_ids_are_not_converted(self):
+        converter = ChargerIdConverter()
+        self.assertEqual(converter.to_python('0042'), '0042')
+        self.assertEqual(converter.to_url('0042'), '0042')
+
+@override_settings(CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class CallHandlerTests(TransactionTestCase):
+    '''
+    Tests issuing calls to the chargers and awaiting their call results
+    '''
+
+    def setUp(self):
+        # The call handler keeps the channel layer it got for the first call, which
+        # might not be the channel layer of these tests
+        call._channel_layer = None
+        self.request = RemoteStartTransaction_Req(idTag = IdToken(IdToken = 'RandomToken'), connectorId = 1)
+
+    async def test_call_result_wakes_the_awaiting_call(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/ocpp/CP_1/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        task = asyncio.ensure_future(Call.CallHandler.issue_command('CP_1', self.request, await_period = 5))
+        message = json_loads(await communicator.receive_from())
+        self.assertEqual(message[2:], ['RemoteStartTransaction', {'idTag': {'IdToken': 'RandomToken'}, 'connectorId': 1}])
+
+        # The call result is handed to the call as soon as it's received, well before
+        # the period of the call is over
+        await communicator.send_to(text_data = json_dumps([3, message[1], {'status': 'Accepted'}]))
+        self.assertEqual(await asyncio.wait_for(task, 1), (3, message[1], {'status': 'Accepted'}))
+        self.assertNotIn(('CP_1', message[1]), Call.CallHandler._pending)
+
+        await communicator.disconnect()
+        await call_writer.flush()
+        call_obj = await database_sync_to_async(ocpp_models.Call.objects.get)(message_id = message[1])
+        self.assertIsNotNone(call_obj.call_result_obj_id)
+
+    def test_call_result_is_ignored_without_an_awaiting_call(self):
+        Call.CallHandler.resolve_response('CP_1', 'unknown', (3, 'unknown', {}))
+        self.assertEqual(Call.CallHandler._pending, {})
+
+    async def test_call_results_with_an_invalid_message_id_are_ignored(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/ocpp/CP_1/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        # The invalid call result arrives while a call is awaiting its call result, and
+        # neither the call nor the connection are affected by it
+        task = asyncio.ensure_future(Call.CallHandler.issue_command('CP_1', self.request, await_period = 5))
+        message = json_loads(await communicator.receive_from())
+        with self.assertLogs('ocpp', 'CRITICAL'):
+            await communicator.send_to(text_data = json_dumps([3, [message[1]], {'status': 'Accepted'}]))
+            await communicator.send_to(text_data = json_dumps([3, message[1], {'status': 'Accepted'}]))
+            self.assertEqual(await asyncio.wait_for(task, 1), (3, message[1], {'status': 'Accepted'}))
+
+        await communicator.disconnect()
+        await call_writer.flush()
+        self.assertEqual(await database_sync_to_async(ocpp_models.CallResult.objects.count)(), 1)
+
+    async def test_pending_call_is_removed_when_sending_fails(self):
+        Call.CallHandler._charger_channels['CP_2'] = 'not a channel name'
+        try:
+            with self.assertRaises(TypeError):
+                await Call.CallHandler.issue_command('CP_2', self.request, await_period = 1)
+        finally:
+            del Call.CallHandler._charger_channels['CP_2']
+
+        self.assertEqual(Call.CallHandler._pending, {})
+
+    def test_call_issued_outside_the_server_is_saved(self):
+        async_to_sync(Call.CallHandler.issue_command)('CP_3', self.request, shouldAwait = False)
+        self.assertTrue(ocpp_models.Call.objects.filter(charger_id = 'CP_3', action = 'RemoteStartTransaction').exists())
+
+@override_settings(CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class OcppConsumerTests(TransactionTestCase):
+    '''
+    Tests handling the messages which the chargers send to the consumer
+    '''
+
+    async def test_calls_with_an_invalid_message_id_or_action_are_ignored(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/ocpp/CP_1/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        # The connection is kept open after the invalid calls, so the charger still gets
+        # the response to the valid call
+        with self.assertLogs('ocpp', 'CRITICAL'):
+            await communicator.send_to(text_data = json_dumps([2, 'a', ['Heartbeat'], {}]))
+            await communicator.send_to(text_data = json_dumps([2, ['a'], 'Heartbeat', {}]))
+            await communicator.send_to(text_data = json_dumps([2, 'b', 'Heartbeat', {}]))
+            message = json_loads(await communicator.receive_from())
+        self.assertEqual(message[:2], [3, 'b'])
+
+        await communicator.disconnect()
+
+class SerializeTests(SimpleTestCase):
+    '''
+    Tests the payloads which the generated `serialize` methods of the OCPP types create
+
+    ## Description
+    The expected payloads are the same ones which were created before the `serialize`
+    methods were generated.
+    '''
+
+    def setUp(self):
+        self.date_time = datetime.datetime(2021, 1, 1)
+        self.charging_profile = ChargingProfile(
+            chargingProfileId = 1,
+            stackLevel = 0,
+            chargingProfilePurpose = ChargingProfilePurposeType.TxProfile,
+            chargingProfileKind = ChargingProfileKindType.Absolute,
+            chargingSchedule = ChargingSchedule(
+                chargingRateUnit = ChargingRateUnitType.A,
+                chargingSchedulePeriod = [
+                    ChargingSchedulePeriod(startPeriod = 0, limit = 8.1),
+                    ChargingSchedulePeriod(startPeriod = 60, limit = 16, numberPhases = 3),
+                ],
+                startSchedule = self.date_time,
+            ),
+            validTo = self.date_time,
+        )
+        self.charging_profile_payload = {
+            'chargingProfileId': 1,
+            'stackLevel': 0,
+            'chargingProfilePurpose': 'TxProfile',
+            'chargingProfileKind': 'Absolute',
+            'chargingSchedule': {
+                'chargingRateUnit': 'A',
+                'chargingSchedulePeriod': [
+                    {'startPeriod': 0, 'limit': 8.1},
+                    {'startPeriod': 60, 'limit': 16, 'numberPhases': 3},
+                ],
+                'startSchedule': '2021-01-01T00:00:00',
+            },
+            'validTo': '2021-01-01T00:00:00',
+        }
+
+    def test_nested_types_enums_and_dates(self):
+        id_tag_info = IdTagInfo(AuthorizationStatus.Accepted, IdToken('x'), datetime.date(2021, 1, 1))
+        self.assertEqual(id_tag_info.serialize(), {'status': 'Accepted', 'parentIdTag': {'IdToken': 'x'}, 'expiryDate': '2021-01-01'})
+        self.assertEqual(str(id_tag_info), '{"status":"Accepted","parentIdTag":{"IdToken":"x"},"expiryDate":"2021-01-01"}')
+
+        boot_notification = BootNotification_Conf(self.date_time.replace(tzinfo = datetime.timezone.utc), 5, RegistrationStatus.Accepted)
+        self.assertEqual(boot_notification.serialize(), {'currentTime': '2021-01-01T00:00:00+00:00', 'interval': 5, 'status': 'Accepted'})
+
+    def test_lists_of_types(self):
+        self.assertEqual(self.charging_profile.serialize(), self.charging_profile_payload)
+
+        request = RemoteStartTransaction_Req(IdToken('a'), self.charging_profile, 1)
+        self.assertEqual(request.serialize(), {'idTag': {'IdToken': 'a'}, 'chargingProfile': self.charging_profile_payload, 'connectorId': 1})
+
+        request = SendLocalList_Req(1, [AuthorizationData(IdToken('a'), IdTagInfo(AuthorizationStatus.Accepted))], UpdateType.Full)
+        self.assertEqual(request.serialize(), {
+            'listVersion': 1,
+            'localAuthorizationList': [{'idTag': {'IdToken': 'a'}, 'idTagInfo': {'status': 'Accepted'}}],
+            'updateType': 'Full',
+        })
+
+    def test_optional_fields_are_left_out(self):
+        self.assertEqual(StopTransaction_Conf().serialize(), {})
+        self.assertEqual(GetConfiguration_Req().serialize(), {})
+        self.assertEqual(GetConfiguration_Req(key = None).serialize(), {})
+        self.assertEqual(GetConfiguration_Req('a').serialize(), {'key': ['a']})
+        self.assertEqual(GetConfiguration_Req(['a', 'b']).serialize(), {'key': ['a', 'b']})
+
+    def test_fields_passed_as_keyword_arguments(self):
+        class KeywordType(OcppType):
+            def __init__(self, **kwargs):
+                OcppType.__init__(self, **kwargs)
+
+        class InheritedConstructorType(OcppType):
+            pass
+
+        class MixedType(OcppType):
+            def __init__(self, connectorId:int, **kwargs):
+                self.connectorId = connectorId
+                OcppType.__init__(self, **kwargs)
+
+        self.assertEqual(KeywordType(idTag = IdToken('a'), connectorId = None).serialize(), {'idTag': {'IdToken': 'a'}})
+        self.assertEqual(InheritedConstructorType(key = ['a', 'b']).serialize(), {'key': ['a', 'b']})
+        self.assertEqual(MixedType(1, status = AuthorizationStatus.Accepted).serialize(), {'connectorId': 1, 'status': 'Accepted'})
+
+        # The OcppType class itself has no fields and no `__dict__` to store them in
+        with self.assertRaises(AttributeError):
+            OcppType(connectorId = 1)
+
+    def test_inherited_serialize_methods_are_kept(self):
+        class CustomType(OcppType):
+            def __init__(self, connectorId:int):
+                self.connectorId = connectorId
+
+            def serialize(self) -> dict:
+                return {'connector': self.connectorId}
+
+        class CustomChildType(CustomType):
+            def __init__(self, connectorId:int, transactionId:int):
+                CustomType.__init__(self, connectorId)
+                self.transactionId = transactionId
+
+        class IdTokenChildType(IdToken):
+            def __init__(self, IdToken:str, connectorId:int):
+                self.IdToken = IdToken
+                self.connectorId = connectorId
+
+        self.assertEqual(CustomChildType(1, 2).serialize(), {'connector': 1})
+        self.assertEqual(str(CustomChildType(1, 2)), '{"connector":1}')
+
+        # A serialize method created for a parent is replaced by one for the child's fields
+        self.assertEqual(IdTokenChildType('a', 1).serialize(), {'IdToken': 'a', 'connectorId': 1})
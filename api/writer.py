@@ -0,0 +1,341 @@
+import asyncio, logging, weakref
+from channels.db import database_sync_to_async
+from django.db import connection, transaction
+
+from . import models as ocpp_models
+
+# Initialize the logger
+logger = logging.getLogger('ocpp')
+
+class CallWriter():
+    '''
+    Saves calls and their call results to the database in batches
+
+    ## Description
+    Saving a call and its call result as soon as they're created costs a number of
+    database round trips for every message that a charger sends. This writer puts
+    them in a queue instead, and a background task saves everything that has been 
+    queued in one transaction. This way the cost of the round trips is shared between
+    all of the messages received in a batch.
+
+    A queue and the task saving it can only be used within one event loop, so every
+    running event loop which queues pairs gets its own. They're removed once all of 
+    the pairs queued in them have been saved. If the event loop shuts down while pairs 
+    are still queued, they're saved before the task stops.
+
+    The pairs queued by the server are saved in the background. Code running outside 
+    of the server, in an event loop that might be closed as soon as it's done, needs to
+    `flush` the writer to wait for the pairs that it has queued to be saved.
+
+    Calls sent to the chargers are queued on their own and so are the call results
+    the chargers send back for them. Since everything is saved in the order it was 
+    queued, a call is normally saved before or together with its call result, and the
+    call result is linked to it when the batch is saved. A call result without a call
+    is saved on its own and is linked to its call once the call is saved.
+
+    ## Parameters
+    - `max_batch_size` (int): The maximum number of call and call result pairs which
+    are saved in a single batch. Has a default value of 500.
+    - `max_batch_delay` (float): How long (in seconds) the writer waits for more pairs
+    to arrive before saving a batch. Has a default value of 0.05 seconds.
+    '''
+
+    def __init__(self, max_batch_size:int = 500, max_batch_delay:float = 0.05):
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+
+        # The queues and the tasks saving them keyed by their event loop. They're 
+        # created when the first pair is queued in an event loop since they need to
+        # be created while it is running
+        self.__queues = {}
+        self.__tasks = {}
+
+        # The event loops which the server runs in, see `serve`
+        self.__server_loops = weakref.WeakSet()
+
+    def serve(self) -> None:
+        '''
+        Marks the running event loop as one which the server runs in
+
+        ## Description
+        The consumers call this method when a charger connects. The pairs queued from 
+        the event loops of the server are saved in the background, without anything in
+        the server having to wait for them.
+        '''
+        self.__server_loops.add(asyncio.get_running_loop())
+
+    def is_serving(self) -> bool:
+        '''
+        Checks if the running event loop is one which the server runs in
+
+        ## Returns
+        - `bool`: True if `serve` has been called from the running event loop
+        '''
+        return asyncio.get_running_loop() in self.__server_loops
+
+    def enqueue(self, call_obj:ocpp_models.Call = None, call_result_obj:ocpp_models.CallResult = None) -> None:
+        '''
+        Queues a call and its call result to be saved and linked
+
+        ## Description
+        This method does not wait for the database. The pair is saved by the
+        background task of the running event loop together with the other pairs in 
+        its batch. This method must be called from within a running event loop.
+
+        Either one of the objects can be left out. A call without a call result is 
+        saved on its own. A call result without a call is linked to the call sent to
+        the same charger with the same message id.
+
+        ## Parameters
+        - `call_obj` (Call): The call object obtained from the models
+        - `call_result_obj` (CallResult): The call result object obtained from the models
+        '''
+        loop = asyncio.get_running_loop()
+
+        # Starting the queue and the background task of this event loop if it has none
+        queue = self.__queues.get(loop)
+        if queue is None:
+            queue = self.__queues[loop] = asyncio.Queue()
+            self.__tasks[loop] = loop.create_task(self.__run(loop, queue))
+
+        queue.put_nowait((call_obj, call_result_obj))
+
+    async def flush(self) -> None:
+        '''
+        Waits until all of the pairs queued from the running event loop have been saved
+        '''
+        queue = self.__queues.get(asyncio.get_running_loop())
+        if queue is not None:
+            await queue.join()
+
+    async def __run(self, loop:asyncio.AbstractEventLoop, queue:asyncio.Queue) -> None:
+        '''
+        The background task which saves the pairs queued in an event loop in batches
+        '''
+        batch = []
+        saving = None
+        try:
+            while not queue.empty():
+                # Giving the other messages a short period to be queued so that they're 
+                # saved together with the first pair
+                batch.append(queue.get_nowait())
+                await asyncio.sleep(self.max_batch_delay)
+
+                while len(batch) < self.max_batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+
+                # The batch is saved in another thread which keeps on going if this task
+                # is cancelled, so it is shielded to be able to wait for it to be done
+                saving = asyncio.ensure_future(self.__save(queue, batch))
+                batch = []
+                await asyncio.shield(saving)
+                saving = None
+        except asyncio.CancelledError:
+            # The event loop is shutting down. The batch being saved is waited for and
+            # the rest of the pairs are saved before the task stops
+            if saving is not None:
+                await saving
+
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            if batch:
+                await self.__save(queue, batch)
+            raise
+        finally:
+            # Once the queue is empty the event loop does not need to be kept. Pairs 
+            # queued after this get a new queue and task
+            del self.__queues[loop]
+            del self.__tasks[loop]
+
+    async def __save(self, queue:asyncio.Queue, batch:list) -> None:
+        '''
+        Saves a batch taken from the queue and marks its pairs as done, waking up the 
+        `flush` calls once all of the queued pairs are done
+        '''
+        try:
+            await database_sync_to_async(CallWriter.__save_batch, thread_sensitive = False)(batch)
+        except Exception:
+            logger.exception("Failed to save a batch of %s calls and call results", len(batch))
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+    @staticmethod
+    def __find_calls(call_result_objs:list) -> dict:
+        '''
+        Finds the calls which were sent to the chargers for the given call results
+
+        ## Parameters
+        - `call_result_objs` (list): The call results which the chargers sent back
+
+        ## Returns
+        - `dict`: The ids of the calls and whether they're already linked to a call result,
+        keyed by their charger id and message id. If more than one call matches a call 
+        result then its value is `None`.
+        '''
+        calls = {}
+        matching_calls = ocpp_models.Call.objects.filter(
+            direction = 'S2C',
+            charger_id__in = {call_result_obj.charger_id for call_result_obj in call_result_objs},
+            message_id__in = {call_result_obj.message_id for call_result_obj in call_result_objs},
+        ).values_list('charger_id', 'message_id', 'id', 'call_result_obj')
+
+        for charger_id, message_id, call_obj_id, call_result_obj_id in matching_calls:
+            key = (charger_id, message_id)
+            calls[key] = None if key in calls else (call_obj_id, call_result_obj_id is not None)
+
+        return calls
+
+    @staticmethod
+    def __link_waiting_call_results(call_objs:list) -> None:
+        '''
+        Links the given calls to the call results which were saved before them
+
+        ## Description
+        A call result sent back by a charger is saved without a call if its call has not 
+        been saved yet, for example when the call was issued from another process which
+        had not saved it in time. These call results are linked once their call is saved.
+
+        ## Parameters
+        - `call_objs` (list): The saved calls which were sent to the chargers on their own
+        '''
+        call_result_ids = dict(
+            ((charger_id, message_id), call_result_obj_id)
+            for charger_id, message_id, call_result_obj_id in ocpp_models.CallResult.objects.filter(
+                direction = 'C2S',
+                call_obj__isnull = True,
+                charger_id__in = {call_obj.charger_id for call_obj in call_objs},
+                message_id__in = {call_obj.message_id for call_obj in call_objs},
+            ).values_list('charger_id', 'message_id', 'id')
+        )
+        if not call_result_ids:
+            return
+
+        linked_call_objs, linked_call_result_objs = [], []
+        for call_obj in call_objs:
+            call_result_obj_id = call_result_ids.pop((call_obj.charger_id, call_obj.message_id), None)
+            if call_result_obj_id is None:
+                continue
+
+            call_obj.call_result_obj_id = call_result_obj_id
+            linked_call_objs.append(call_obj)
+            linked_call_result_objs.append(ocpp_models.CallResult(pk = call_result_obj_id, call_obj_id = call_obj.pk))
+
+        ocpp_models.Call.objects.bulk_update(linked_call_objs, ['call_result_obj'])
+        ocpp_models.CallResult.objects.bulk_update(linked_call_result_objs, ['call_obj'])
+
+    @staticmethod
+    def __save_pairs(batch:list, bulk_insert:bool) -> None:
+        '''
+        Saves and links a batch of calls and call results
+
+        ## Parameters
+        - `batch` (list): A list of `(Call, CallResult)` tuples to save. Either one of
+        them can be `None`.
+        - `bulk_insert` (bool): Whether the calls and the call results are each saved 
+        with a single insert
+        '''
+        # The calls are saved first so that the call results can be linked to them
+        call_objs = [call_obj for call_obj, _ in batch if call_obj is not None]
+        if bulk_insert:
+            ocpp_models.Call.objects.bulk_create(call_objs)
+        else:
+            for call_obj in call_objs:
+                call_obj.save()
+
+        # Linking the calls which were queued on their own to the call results which 
+        # were saved before them
+        lone_call_objs = [call_obj for call_obj, call_result_obj in batch if call_obj is not None and call_result_obj is None]
+        if lone_call_objs:
+            CallWriter.__link_waiting_call_results(lone_call_objs)
+
+        # Finding the calls of the call results which were queued on their own
+        lone_call_result_objs = [call_result_obj for call_obj, call_result_obj in batch if call_obj is None]
+        calls = CallWriter.__find_calls(lone_call_result_objs) if lone_call_result_objs else {}
+
+        call_result_objs = []
+        linked_keys = set()
+        for call_obj, call_result_obj in batch:
+            if call_result_obj is None:
+                continue
+
+            if call_obj is not None:
+                call_result_obj.call_obj = call_obj
+                call_result_objs.append(call_result_obj)
+                continue
+
+            # A call result which can not be linked to a single call is saved without one.
+            # A call which already has a call result means that the charger sent the call
+            # result again, so the duplicate is not saved
+            key = (call_result_obj.charger_id, call_result_obj.message_id)
+            if key not in calls:
+                logger.warning("Attempted to find a call message with the message id of '%s' but was not able to find any, saving the call result without it", call_result_obj.message_id)
+            elif calls[key] is None:
+                logger.critical("Attempted to find a call message with the message id of '%s' but found multiple matching calls, saving the call result without it", call_result_obj.message_id)
+            elif calls[key][1] or key in linked_keys:
+                logger.warning("Charger '%s' sent the call result of the message with the id of '%s' more than once, ignoring the duplicate", call_result_obj.charger_id, call_result_obj.message_id)
+                continue
+            else:
+                call_result_obj.call_obj_id = calls[key][0]
+                linked_keys.add(key)
+
+            call_result_objs.append(call_result_obj)
+
+        if bulk_insert:
+            ocpp_models.CallResult.objects.bulk_create(call_result_objs)
+        else:
+            for call_result_obj in call_result_objs:
+                call_result_obj.save()
+
+        # Linking the calls to their call results with a single update
+        ocpp_models.Call.objects.bulk_update(
+            [ocpp_models.Call(pk = call_result_obj.call_obj_id, call_result_obj = call_result_obj) for call_result_obj in call_result_objs if call_result_obj.call_obj_id is not None],
+            ['call_result_obj']
+        )
+
+    @staticmethod
+    def __save_batch(batch:list) -> None:
+        '''
+        Saves and links a batch of calls and call results in a single transaction
+
+        ## Description
+        If the batch can not be saved in one transaction then its pairs are saved one
+        by one, each in its own transaction, so that a single bad pair does not lose the
+        rest of the batch. The batch is saved in a thread of its own rather than in the 
+        thread shared by the synchronous code of the server, so that it can still be saved
+        while an event loop is shutting down.
+
+        ## Parameters
+        - `batch` (list): A list of `(Call, CallResult)` tuples to save. Either one of
+        them can be `None`.
+        '''
+        # When the database returns the primary keys of bulk inserts, the calls and
+        # the call results are each saved with a single insert
+        bulk_insert = connection.features.can_return_rows_from_bulk_insert
+
+        try:
+            with transaction.atomic():
+                CallWriter.__save_pairs(batch, bulk_insert)
+            return
+        except Exception:
+            logger.exception("Failed to save a batch of %s calls and call results, saving them one by one", len(batch))
+
+        for pair in batch:
+            # The objects might have been given primary keys and links by the failed 
+            # transaction, which were rolled back with it
+            call_obj, call_result_obj = pair
+            if call_obj is not None:
+                call_obj.pk = None
+                call_obj.call_result_obj = None
+            if call_result_obj is not None:
+                call_result_obj.pk = None
+                call_result_obj.call_obj = None
+
+            try:
+                with transaction.atomic():
+                    CallWriter.__save_pairs([pair], False)
+            except Exception:
+                logger.exception("Failed to save the message with the id of '%s'", (call_obj or call_result_obj).message_id)
+
+# The writer used by the consumers and the call handler
+call_writer = CallWriter()
@@ -85,14 +85,31 @@ TEMPLATES = [
 WSGI_APPLICATION = 'ocpp.wsgi.application'
 ASGI_APPLICATION = 'ocpp.asgi.application'
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
-        'CONFIG': {
-            "hosts": [('127.0.0.1', 6379)],
+# The in memory channel layer skips the serialization and the round trip to Redis
+# for every group message. It only works when the chargers and everything that
+# sends commands to them run in a single process, so Redis is used by default.
+if config('USE_IN_MEMORY_CHANNEL_LAYER', default=False, cast=bool):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {
+                'capacity': 10000,
+            },
         },
-    },
-}
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                "hosts": [('127.0.0.1', 6379)],
+            },
+        },
+    }
+
+# The maximum number of issued OCPP calls which can be sent to the chargers or
+# look up their call results in the database at the same time
+OCPP_MAX_INFLIGHT = config('OCPP_MAX_INFLIGHT', default=64, cast=int)
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -101,6 +118,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+
+        # Keep the database connections open between the queries made by the
+        # consumers. Every `database_sync_to_async` call closes connections that
+        # are older than this, so with the default of 0 each query would open a
+        # new connection.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
     }
 }
 
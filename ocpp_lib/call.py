@@ -14,17 +14,18 @@
 # Date: 12-Jun-2021                                   #
 # --------------------------------------------------- #
 
-import datetime, json, time, logging, asyncio, concurrent.futures
+import time, logging, asyncio, concurrent.futures, weakref
 from ocpp_lib.utils import random_message_id
 from os import stat
 from typing import Union
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.sync import async_to_sync
 from api import models as ocpp_models
+from api.writer import call_writer
 from channels.db import database_sync_to_async
+from django.conf import settings
 
 from . import decorators, utils
-from . import types as ocpp_types
 from .types import (
     OcppType, 
 
@@ -47,7 +48,6 @@ from .types import (
 from .enums import (
     AuthorizationStatus,
     DataTransferStatus,
-    OCPPCommands,
     RegistrationStatus,
     OCPPMessageType
 )
@@ -59,6 +59,49 @@ from .exceptions import (
 
 logger = logging.getLogger('ocpp')
 
+# The payloads of the call results which never change. They're serialized once
+# when the module is loaded instead of every time that a call is received. These
+# are shared between all of the call results, so they must not be modified
+_STATUS_NOTIFICATION_PAYLOAD = StatusNotification_Conf().serialize()
+_STOP_TRANSACTION_PAYLOAD = StopTransaction_Conf().serialize()
+_METER_VALUES_PAYLOAD = MeterValues_Conf().serialize()
+_FIRMWARE_STATUS_NOTIFICATION_PAYLOAD = FirmwareStatusNotification_Conf().serialize()
+_DIAGNOSTICS_STATUS_NOTIFICATION_PAYLOAD = DiagnosticsStatusNotification_Conf().serialize()
+_AUTHORIZE_PAYLOAD = Authorize_Conf(idTagInfo = IdTagInfo(status = AuthorizationStatus.Accepted)).serialize()
+_DATA_TRANSFER_PAYLOAD = DataTransfer_Conf(status = DataTransferStatus.Accepted).serialize()
+
+# The type of the channel layer events which the consumers handle by sending the
+# message in them to their charger
+_SEND_OCPP_MESSAGE = 'send_ocpp_message'
+
+# Limits how many calls can be sent or look up their call results in the database
+# at the same time, so that a burst of calls waits instead of flooding the channel
+# layer and the database. A semaphore can only be used within one event loop, so
+# every running event loop gets its own, created when it issues its first call
+_inflight_semaphores = weakref.WeakKeyDictionary()
+
+def _get_inflight_semaphore() -> asyncio.Semaphore:
+    '''
+    Gets the semaphore of the running event loop which limits the calls in flight,
+    creating it if needed
+
+    ## Description
+    The limit is taken from the `OCPP_MAX_INFLIGHT` setting which has a default
+    value of 64.
+
+    ## Returns
+    - `asyncio.Semaphore`: The semaphore limiting the calls in flight
+    '''
+    loop = asyncio.get_running_loop()
+    semaphore = _inflight_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _inflight_semaphores[loop] = asyncio.Semaphore(getattr(settings, 'OCPP_MAX_INFLIGHT', 64))
+    return semaphore
+
+# The channel layer used to send the calls to the chargers. It is obtained when
+# the first call is issued, since the settings need to be loaded first
+_channel_layer = None
+
 class Call():
     # The ID used in the messages
     ID = OCPPMessageType.CALL
@@ -74,57 +117,103 @@ class Call():
         class issues Call requests to the chargers.
         '''
 
+        # The futures of the calls which are awaiting their call results, keyed by the
+        # charger id and the message id of the call. The consumer receiving the call
+        # result resolves the future so that the call result does not need to be
+        # polled for in the database
+        _pending = {}
+
+        # The channel names of the consumers of the chargers connected to this process,
+        # keyed by their charger id. Calls to these chargers are sent to their channel
+        # directly instead of through their group
+        _charger_channels = {}
+
         @staticmethod
-        @database_sync_to_async
-        def __save_call(message_type:OCPPMessageType, message_id:str, action:OCPPCommands, payload:dict, charger_id:str) -> ocpp_models.Call:
+        def __save_call(ocpp_message:list, charger_id:str) -> ocpp_models.Call:
             '''
             Saves a call message to the Django database using the models
 
             ## Description
-            This method takes in the arguments required for a call to be made and then
-            saves this call to the databse by using the Django `Call` model in the api
-            app. 
+            This method takes in the call message which is being issued and then queues 
+            this call to be saved to the databse by using the Django `Call` model in the 
+            api app. The call is saved in the background with the other messages queued
+            around the same time, so this method does not wait for the database.
 
             ## Parameters
-            - `message_type` (OCPPMessageType): The OCPP message type id. Since this is 
-            a call then we are expecting the `message_type` to be 2.
-            - `message_id` (str): The unique message id to use in saving the call object
-            - `action` (OCPPCommands): The action in the OCPP message.
-            - `payload` (dict): The payload in the OCPP message.
+            - `ocpp_message` (list): The OCPP call message being issued. This follows the
+            format of `[ message_type_id, message_id, action, payload ]`.
             - `charger_id` (str): A string of the `charger id` to issue the command to
             '''
 
-            # Creating and saving and the call object
+            # Creating and queueing the call object to be saved. The fields are taken
+            # straight from the message being issued
+            message_type_id, message_id, action, payload = ocpp_message
             call_object = ocpp_models.Call(
-                message_type_id = message_type.value,
+                message_type_id = message_type_id,
                 message_id = message_id,
-                action = action.value,
+                action = action,
                 payload = payload,
 
                 charger_id = charger_id,
-                sent_at = datetime.datetime.utcnow(),
                 direction = 'S2C',
             )
-            call_object.save()
+            call_writer.enqueue(call_obj = call_object)
 
             # Returning the call object
             return call_object
 
         @staticmethod
-        async def __await_response(message_id:str, await_period:float, await_interval:float = 0.2) -> list:
+        def resolve_response(charger_id:str, message_id:str, call_result:tuple) -> None:
+            '''
+            Hands a call result to the call that is awaiting it
+
+            ## Description
+            This method is used by the consumer when a charger sends a call result. If a call
+            issued in this process is awaiting the call result then it gets it directly. If no
+            call is awaiting it then nothing is done.
+
+            ## Parameters
+            - `charger_id` (str): A string of the `charger id` which sent the call result
+            - `message_id` (str): A string of the message id of the call result
+            - `call_result` (tuple): The message type id, message id and payload of the call result
+            '''
+            future = Call.CallHandler._pending.pop((charger_id, message_id), None)
+            if future is None:
+                return
+
+            # The future might belong to an event loop running in another thread, so it
+            # is resolved from within its own loop
+            future.get_loop().call_soon_threadsafe(Call.CallHandler.__set_future_result, future, call_result)
+
+        @staticmethod
+        def __set_future_result(future:asyncio.Future, result) -> None:
+            '''
+            Sets the result of the future if it has not been cancelled or timed out already
+            '''
+            if not future.done():
+                future.set_result(result)
+
+        @staticmethod
+        async def __await_response(charger_id:str, message_id:str, future:asyncio.Future, await_period:float, await_interval:float = 0.2) -> list:
             '''
             Awaits the client's response to the message with the same message_id
 
             ## Description
             This is a private method that takes in the `message_id` and the `await_period` and
-            then based on these parameters it will await for the client response to the registered
-            in the database. If the client did not respond during the `await_period` specified, then
-            the function will return a None. 
+            then based on these parameters it will await for the client response. The response
+            is normally handed over directly by the consumer that receives it. If the charger is
+            connected to another process then the response is only saved in the database by that
+            process, so the database is also checked every `await_interval` while waiting. If the 
+            client did not respond during the `await_period` specified, then the function will 
+            return a None. 
 
             ## Parameters
+            - `charger_id` (str): A string of the `charger id` that the call was issued to
             - `message_id` (str): A string of the message id. This should be the same as the message id 
             that the call request was sent with. This way, the call and call result can be matched to 
             each other.
+            - `future` (asyncio.Future): The future which is resolved with the call result when the
+            consumer receives it.
             - `await_period` (float): The total period (in seconds) that the function is allowed to wait 
             before declaring the message as being lost or not arriving. Typically, if you set this for too
             long of a period you could have performance issues. But you should also understand that too
@@ -140,18 +229,37 @@ class Call():
             # The total number of cycles which we will await
             await_cycles = int(await_period / await_interval)
 
-            # Using a for loop to wait for this period
+            # Using a for loop to wait for this period. The future is shielded so that
+            # it is not cancelled when an interval passes without a response
             for i in range(0, await_cycles, 1):
                 try:
-                    objects = await sync_to_async(ocpp_models.CallResult.objects.get)(message_id = message_id)
-                    return objects.message_type_id, objects.message_id, objects.payload
-                except:
+                    return await asyncio.wait_for(asyncio.shield(future), await_interval)
+                except asyncio.TimeoutError:
                     pass
 
-                await asyncio.sleep(await_interval)
+                # The consumer of a charger connected to this process always resolves the
+                # future, so the database only needs to be checked for the chargers which
+                # are connected to another process
+                if charger_id in Call.CallHandler._charger_channels:
+                    continue
+
+                # Only a missing call result means that the charger has not responded
+                # yet, any other error is raised instead of being retried until the
+                # period is over. Only the columns which are returned are selected, 
+                # and they're returned as a tuple without creating a CallResult object
+                try:
+                    async with _get_inflight_semaphore():
+                        return await database_sync_to_async(
+                            ocpp_models.CallResult.objects.values_list('message_type_id', 'message_id', 'payload').get
+                        )(
+                            charger_id = charger_id,
+                            message_id = message_id
+                        )
+                except ocpp_models.CallResult.DoesNotExist:
+                    pass
 
             # If no object has been found then return None
-            logger.warning(f"Sent a call message with the ID '{message_id}' but no call result was recieved back.")
+            logger.warning("Sent a call message with the ID '%s' but no call result was received back.", message_id)
             return None
 
         @staticmethod
@@ -185,45 +293,73 @@ class Call():
             the database
             '''
             
-            # Checking the request class and subclass to make sure that they
-            # match what is expected
-            try:
-                getattr(ocpp_types, request.__class__.split('.')[-1])
-            except:
+            # Checking the request class to make sure that it is one of the requests
+            # in the ocpp_lib.types. They're registered with their action name when 
+            # they're defined
+            action = OcppType._registry.get(type(request))
+            if action is None:
                 raise OCPPInvalidType(f"An invalid request was sent. The request has a class of {request.__class__} but only requests from the ocpp_lib.types are accepted.")
 
             # Creating the request and getting the full OCPP message
             ocpp_message:list = [
                 OCPPMessageType.CALL.value,
                 utils.random_message_id(),
-                str(type(request)).split('.')[-1].strip("'>").split('_')[0],
+                action,
                 request.serialize()
             ]
 
             # Getting the elements of the message
             message_type, message_id, action, payload = ocpp_message
 
-            # Saving the call object to the database
-            await Call.CallHandler.__save_call(
-                message_type = OCPPMessageType(message_type),
-                message_id = message_id,
-                action = OCPPCommands[action],
-                payload = payload,
-                charger_id = charger_id
-            )
+            # Saving the call object to the database. Outside of the server the event loop
+            # might be closed as soon as the call is issued, and the charger's response is
+            # saved by the server, so the call is saved before it's sent instead of in the 
+            # background
+            Call.CallHandler.__save_call(ocpp_message, charger_id)
+            if not call_writer.is_serving():
+                await call_writer.flush()
+
+            # Registering the future which the consumer resolves when the call result is
+            # received. This is done before sending so that a fast response is not missed
+            if shouldAwait:
+                future = asyncio.get_running_loop().create_future()
+                Call.CallHandler._pending[(charger_id, message_id)] = future
 
-            # Getting the django channels channel_layer and then sending it the OCPP message
-            await get_channel_layer().group_send(
-                f'ocpp_{charger_id}',
-                {
-                    'type': 'send_ocpp_message',
-                    'message': json.dumps(ocpp_message)
+            # The future is removed once the call is done with it, including when sending
+            # the call fails, so that it does not stay registered forever
+            try:
+                # Getting the django channels channel_layer and then sending it the OCPP message
+                global _channel_layer
+                if _channel_layer is None:
+                    _channel_layer = get_channel_layer()
+
+                event = {
+                    'type': _SEND_OCPP_MESSAGE,
+                    'message': utils.json_dumps(ocpp_message)
                 }
-            )
 
-            # If the function was asked to await for a response
-            if shouldAwait:
-                return await Call.CallHandler.__await_response(message_id = message_id, await_period = await_period, await_interval=await_interval)
+                # If the charger is connected to this process then the message is sent to the
+                # channel of its consumer. Otherwise it's sent to the group of the charger 
+                # which reaches its consumer on any process
+                channel_name = Call.CallHandler._charger_channels.get(charger_id)
+                async with _get_inflight_semaphore():
+                    if channel_name is not None:
+                        await _channel_layer.send(channel_name, event)
+                    else:
+                        await _channel_layer.group_send(f'ocpp_{charger_id}', event)
+
+                # If the function was asked to await for a response
+                if shouldAwait:
+                    return await Call.CallHandler.__await_response(
+                        charger_id = charger_id, 
+                        message_id = message_id, 
+                        future = future, 
+                        await_period = await_period, 
+                        await_interval = await_interval
+                    )
+            finally:
+                if shouldAwait:
+                    Call.CallHandler._pending.pop((charger_id, message_id), None)
 
             # Return the correct return type depending on whether the 
             # should return flag is true or false
@@ -231,18 +367,18 @@ class Call():
 
     class Callbacks():
         '''
-        The callback functions used when a call is recieved.
+        The callback functions used when a call is received.
 
         ## Description
         This class is comprimised of callback functions which are used when a
-        call is recieved. Since this means that the server has received a call 
+        call is received. Since this means that the server has received a call 
         from the client, the callback functions here will respond with a message
         of the type CALL_RESULT
         '''
 
         @staticmethod
         @decorators.call_result_message_decorator
-        def Authorize(message_id:str, call_payload:dict) -> Authorize_Conf:
+        def Authorize(message_id:str, call_payload:dict) -> dict:
             '''
             A callback function for the OCPP `Authorize` action
 
@@ -257,12 +393,9 @@ class Call():
             - `call_payload` (dict): A dictionary of the payload sent in the CALL message.
             '''
 
-            # Returning the response back
-            return Authorize_Conf(
-                idTagInfo = IdTagInfo(
-                    status = AuthorizationStatus.Accepted,
-                )
-            )
+            # Returning the response back. Every id tag is accepted, so the payload is
+            # always the same and the one serialized when the module was loaded is used
+            return _AUTHORIZE_PAYLOAD
 
         @staticmethod
         @decorators.call_result_message_decorator
@@ -283,14 +416,14 @@ class Call():
 
             # Returning the response back
             return BootNotification_Conf(
-                currentTime = datetime.datetime.utcnow(),
+                currentTime = utils.utc_now(),
                 interval = 10,
                 status = RegistrationStatus.Accepted
             )
 
         @staticmethod
         @decorators.call_result_message_decorator
-        def StatusNotification(message_id:str, call_payload:dict) -> StatusNotification_Conf:
+        def StatusNotification(message_id:str, call_payload:dict) -> dict:
             '''
             A callback function for the OCPP `StatusNotification` action
 
@@ -305,8 +438,9 @@ class Call():
             - `call_payload` (dict): A dictionary of the payload sent in the CALL message.
             '''
 
-            # Returning the response back
-            return StatusNotification_Conf()
+            # Returning the response back. The payload is always the same so the one
+            # serialized when the module was loaded is used
+            return _STATUS_NOTIFICATION_PAYLOAD
 
         @staticmethod
         @decorators.call_result_message_decorator
@@ -335,7 +469,7 @@ class Call():
 
         @staticmethod
         @decorators.call_result_message_decorator
-        def StopTransaction(message_id:str, call_payload:dict) -> StopTransaction_Conf:
+        def StopTransaction(message_id:str, call_payload:dict) -> dict:
             '''
             A callback function for the OCPP ` StopTransaction` action
 
@@ -350,12 +484,13 @@ class Call():
             - `call_payload` (dict): A dictionary of the payload sent in the CALL message.
             '''
 
-            # Returning the response back
-            return StopTransaction_Conf()
+            # Returning the response back. The payload is always the same so the one
+            # serialized when the module was loaded is used
+            return _STOP_TRANSACTION_PAYLOAD
 
         @staticmethod
         @decorators.call_result_message_decorator
-        def MeterValues(message_id:str, call_payload:dict) -> MeterValues_Conf:
+        def MeterValues(message_id:str, call_payload:dict) -> dict:
             '''
             A callback function for the OCPP ` MeterValues` action
 
@@ -370,8 +505,9 @@ class Call():
             - `call_payload` (dict): A dictionary of the payload sent in the CALL message.
             '''
 
-            # Returning the response back
-            return MeterValues_Conf()
+            # Returning the response back. The payload is always the same so the one
+            # serialized when the module was loaded is used
+            return _METER_VALUES_PAYLOAD
 
         @staticmethod
         @decorators.call_result_message_decorator
@@ -391,11 +527,11 @@ class Call():
             '''
 
             # Returning the response back
-            return Heartbeat_Conf(currentTime = datetime.datetime.utcnow())
+            return Heartbeat_Conf(currentTime = utils.utc_now())
         
         @staticmethod
         @decorators.call_result_message_decorator
-        def FirmwareStatusNotification(message_id:str, call_payload:dict) -> FirmwareStatusNotification_Conf:
+        def FirmwareStatusNotification(message_id:str, call_payload:dict) -> dict:
             '''
             A callback function for the OCPP ` FirmwareStatusNotification` action
 
@@ -410,12 +546,13 @@ class Call():
             - `call_payload` (dict): A dictionary of the payload sent in the CALL message.
             '''
 
-            # Returning the response back
-            return FirmwareStatusNotification_Conf()
+            # Returning the response back. The payload is always the same so the one
+            # serialized when the module was loaded is used
+            return _FIRMWARE_STATUS_NOTIFICATION_PAYLOAD
         
         @staticmethod
         @decorators.call_result_message_decorator
-        def DiagnosticsStatusNotification(message_id:str, call_payload:dict) -> DiagnosticsStatusNotification_Conf:
+        def DiagnosticsStatusNotification(message_id:str, call_payload:dict) -> dict:
             '''
             A callback function for the OCPP ` DiagnosticsStatusNotification` action
 
@@ -430,12 +567,13 @@ class Call():
             - `call_payload` (dict): A dictionary of the payload sent in the CALL message.
             '''
 
-            # Returning the response back
-            return DiagnosticsStatusNotification_Conf()
+            # Returning the response back. The payload is always the same so the one
+            # serialized when the module was loaded is used
+            return _DIAGNOSTICS_STATUS_NOTIFICATION_PAYLOAD
 
         @staticmethod
         @decorators.call_result_message_decorator
-        def DataTransfer(message_id:str, call_payload:dict) -> DataTransfer_Conf:
+        def DataTransfer(message_id:str, call_payload:dict) -> dict:
             '''
             A callback function for the OCPP ` DataTransfer` action
 
@@ -450,7 +588,6 @@ class Call():
             - `call_payload` (dict): A dictionary of the payload sent in the CALL message.
             '''
 
-            # Returning the response back
-            return DataTransfer_Conf(
-                status = DataTransferStatus.Accepted,
-            )
\ No newline at end of file
+            # Returning the response back. Every data transfer is accepted, so the payload
+            # is always the same and the one serialized when the module was loaded is used
+            return _DATA_TRANSFER_PAYLOAD
\ No newline at end of file
@@ -12,6 +12,9 @@
 
 from . import enums, utils, exceptions
 
+# The names of all of the valid OCPP commands
+_VALID_ACTIONS = frozenset(enums.OCPPCommands.__members__)
+
 def call_message_decorator(function):
     '''
     A decorator used for OCPP CALL messages
@@ -29,31 +32,30 @@ def call_message_decorator(function):
     - `function`: A new function with the modifications needed
 
     ## Raises
-    - `ValueError`: Occurs when the function provided does not return a dictionary
-    - `OCPPInvalidCommand`: Occurs when an invalid OCPP command is issued.
+    - `ValueError`: Occurs when the function provided does not return a dictionary. Not 
+    checked when python is run with optimizations (-O)
+    - `OCPPInvalidCommand`: Occurs when the function decorated is not named after a valid 
+    OCPP command. This is raised when the function is decorated.
     '''
+    # Checking if the function name is of a valid OCPP command.
+    # if its not of a valid OCPP command then throw an Exception.
+    # This is only checked once when the function is decorated
+    if function.__name__ != "serialize" and function.__name__ not in _VALID_ACTIONS:
+        raise exceptions.OCPPInvalidCommand(f"The command {function.__name__} is not a valid OCPP command")
+
     def inner(*args, **kwargs):
         # Performing the function and getting the payload
-        # provided by it. Then we serialize it. This is a 
-        # feature provided by the `OcppType` class
-        try:
-            payload = function(*args, **kwargs).serialize()
-        except:
-            payload = function(*args, **kwargs)
+        # provided by it. Then we serialize it if it is an 
+        # `OcppType`. The function is only performed once
+        result = function(*args, **kwargs)
+        payload = result.serialize() if hasattr(result, 'serialize') else result
 
         # Ensuring that the function returned a valid payload
-        # that is a dict
-        if type(payload) != dict:
+        # that is a dict. This check is skipped when python
+        # is run with optimizations (-O)
+        if __debug__ and not isinstance(payload, dict):
             raise ValueError(f"Function '{function.__name__}' must return a dict.")
 
-        # Checking if the function name is of a valid OCPP command.
-        # if its not of a valid OCPP command then throw an Exception
-        try:
-            if function.__name__ != "serialize":
-                enums.OCPPCommands[function.__name__]
-        except:
-            raise exceptions.OCPPInvalidCommand(f"The command {function.__name__} is not a valid OCPP command")
-
         return [
             # A Call message type
             enums.OCPPMessageType.CALL.value,
@@ -90,35 +92,31 @@ def call_result_message_decorator(function):
     - `function`: A new function with the modifications needed
 
     ## Raises
-    - `ValueError`: Occurs when the function provided does not return a dictionary
-    - `KeyError`: If no `message_id` is provided in the parent function as a keyword
-    argument
+    - `ValueError`: Occurs when the function provided does not return a dictionary. Not 
+    checked when python is run with optimizations (-O)
     '''
-    def inner(*args, **kwargs):
+    # The callbacks are always called with the message id and the payload of the
+    # call, either positionally or as keyword arguments
+    def inner(message_id, call_payload):
         # Performing the function and getting the payload
-        # provided by it
-        try:
-            payload = function(*args, **kwargs).serialize()
-        except:
-            payload = function(*args, **kwargs)
+        # provided by it. Then we serialize it if it is an 
+        # `OcppType`. The function is only performed once
+        result = function(message_id, call_payload)
+        payload = result.serialize() if hasattr(result, 'serialize') else result
 
         # Ensuring that the function returned a valid payload
-        # that is a dict
-        if type(payload) != dict:
+        # that is a dict. This check is skipped when python
+        # is run with optimizations (-O)
+        if __debug__ and not isinstance(payload, dict):
             raise ValueError(f"Function '{function.__name__}' must return a dict.")
 
-        # Checking if a message_id argument was passed in the kwargs. Throwing an
-        # exception if it was not
-        if 'message_id' not in kwargs.keys():
-            raise KeyError("No message_id was passed in the keyword arguments. Did you pass a message_id? Are you sure that the message_id is passed as a named argument?")
-
         return [
             # A Call Result message type
             enums.OCPPMessageType.CALL_RESULT.value,
 
-            # Getting the mssage id which was passed to the
-            # original function as a keyword argyment
-            kwargs.get('message_id'),
+            # The message id which was passed to the original
+            # function
+            message_id,
             
             # Adding the payload to the return
             payload
@@ -8,9 +8,50 @@
 # Date: 12-Jun-2021                                  #
 # -------------------------------------------------- #
 
-from enum import Enum, auto
+from enum import Enum, IntEnum
 
-class OCPPMessageType(Enum):
+class EnumLookup():
+    '''
+    A mixin which gives the enums a fast way of finding a member by its value
+    '''
+
+    @classmethod
+    def lookup(cls, value):
+        '''
+        Finds the member of the enum which has the given value
+
+        ## Description
+        This does the same as calling the enum with the value, but it looks the 
+        member up directly in the dictionary of the members keyed by their values
+        which the enum builds when it is defined. 
+
+        ## Parameters
+        - `value` (Any): The value of the member to find
+
+        ## Returns
+        - `Enum`: The member of the enum which has the given value
+
+        ## Raises
+        - `ValueError`: Occurs when no member of the enum has the given value
+        '''
+        try:
+            return cls._value2member_map_[value]
+        except (KeyError, TypeError):
+            raise ValueError(f"{value!r} is not a valid {cls.__name__}") from None
+
+class OcppEnum(EnumLookup, str, Enum):
+    '''
+    A parent class used to define the enums whose values are strings
+
+    ## Description
+    The members of these enums are strings themselves, so they can be serialized
+    to JSON and compared to strings directly without going through their `value`. 
+    Converting a member to a string gives its value instead of its name.
+    '''
+
+    __str__ = str.__str__
+
+class OCPPMessageType(EnumLookup, IntEnum):
     '''
     The type of the OCPP message being sent.
 
@@ -24,7 +65,7 @@ class OCPPMessageType(Enum):
     CALL_RESULT = 3
     CALL_ERROR  = 4
 
-class OCPPCommands(Enum):
+class OCPPCommands(OcppEnum):
     '''
     All of the OCPP commands in OCPP 1.6
 
@@ -33,35 +74,35 @@ class OCPPCommands(Enum):
     other command that is outside of this is considered as not belonging to OCPP.
     '''
     
-    Authorize                       = auto()
-    BootNotification                = auto()
-    CancelReservation               = auto()
-    ChangeAvailability              = auto()
-    ChangeConfiguration             = auto()
-    ClearCache                      = auto()
-    ClearChargingProfile            = auto()
-    DataTransfer                    = auto()
-    DiagnosticsStatusNotification   = auto()
-    FirmwareStatusNotification      = auto()
-    GetCompositeSchedule            = auto()
-    GetConfiguration                = auto()
-    GetDiagnostics                  = auto()
-    GetLocalListVersion             = auto()
-    Heartbeat                       = auto()
-    MeterValues                     = auto()
-    RemoteStartTransaction          = auto()
-    RemoteStopTransaction           = auto()
-    ReserveNow                      = auto()
-    SendLocalList                   = auto()
-    SetChargingProfile              = auto()
-    StartTransaction                = auto()
-    StatusNotification              = auto()
-    StopTransaction                 = auto()
-    TriggerMessage                  = auto()
-    UnlockConnector                 = auto()
-    UpdateFirmware                  = auto()
-
-class AuthorizationStatus(Enum):
+    Authorize                       = "Authorize"
+    BootNotification                = "BootNotification"
+    CancelReservation               = "CancelReservation"
+    ChangeAvailability              = "ChangeAvailability"
+    ChangeConfiguration             = "ChangeConfiguration"
+    ClearCache                      = "ClearCache"
+    ClearChargingProfile            = "ClearChargingProfile"
+    DataTransfer                    = "DataTransfer"
+    DiagnosticsStatusNotification   = "DiagnosticsStatusNotification"
+    FirmwareStatusNotification      = "FirmwareStatusNotification"
+    GetCompositeSchedule            = "GetCompositeSchedule"
+    GetConfiguration                = "GetConfiguration"
+    GetDiagnostics                  = "GetDiagnostics"
+    GetLocalListVersion             = "GetLocalListVersion"
+    Heartbeat                       = "Heartbeat"
+    MeterValues                     = "MeterValues"
+    RemoteStartTransaction          = "RemoteStartTransaction"
+    RemoteStopTransaction           = "RemoteStopTransaction"
+    ReserveNow                      = "ReserveNow"
+    SendLocalList                   = "SendLocalList"
+    SetChargingProfile              = "SetChargingProfile"
+    StartTransaction                = "StartTransaction"
+    StatusNotification              = "StatusNotification"
+    StopTransaction                 = "StopTransaction"
+    TriggerMessage                  = "TriggerMessage"
+    UnlockConnector                 = "UnlockConnector"
+    UpdateFirmware                  = "UpdateFirmware"
+
+class AuthorizationStatus(OcppEnum):
     '''
     An enum used for the status in `Authorization` requests
     '''
@@ -72,7 +113,7 @@ class AuthorizationStatus(Enum):
     Invalid         = "Invalid"         # Identifier is unknown. Not allowed for charging.
     ConcurrentTx    = "ConcurrentTx"    # Identifier is already involved in another transaction and multiple transactions are not allowed. (Only relevant for a StartTransaction.req.)
 
-class RegistrationStatus(Enum):
+class RegistrationStatus(OcppEnum):
     '''
     An enum used for the status in `BootNotification` requests
     '''
@@ -81,7 +122,7 @@ class RegistrationStatus(Enum):
     Pending         = "Pending"     # Central System is not yet ready to accept the Charge Point. Central System may send messages to retrieve information or prepare the Charge Point.
     Rejected        = "Rejected"    # Charge point is not accepted by Central System. This may happen when the Charge Point id is not known by Central System.
 
-class RemoteStartStopStatus(Enum):
+class RemoteStartStopStatus(OcppEnum):
     '''
     An enum used for the status in `RemoteStartTransaction` and 
     `RemoteStopTransaction` requests
@@ -90,7 +131,7 @@ class RemoteStartStopStatus(Enum):
     Accepted        = "Accepted"    # Command will be executed.
     Rejected        = "Rejected"    # Command will not be executed.
 
-class ChargingProfilePurposeType(Enum):
+class ChargingProfilePurposeType(OcppEnum):
     '''
     An enum used for the charging purpose in the `SetChargingProfile`
     '''
@@ -99,7 +140,7 @@ class ChargingProfilePurposeType(Enum):
     TxDefaultProfile        = "TxDefaultProfile"        # Default profile to be used for new transactions.
     TxProfile               = "TxProfile"               # Profile with constraints to be imposed by the Charge Point on the current transaction. A profile with this purpose SHALL cease to be valid when the transaction terminates.
 
-class ChargingRateUnitType(Enum):
+class ChargingRateUnitType(OcppEnum):
     '''
     An enum used for the charging unit type in the `SetChargingProfile`
     '''
@@ -107,7 +148,7 @@ class ChargingRateUnitType(Enum):
     W   = "W"   # Watts (power).
     A   = "A"   # Amperes (current).
 
-class ChargingProfileKindType(Enum):
+class ChargingProfileKindType(OcppEnum):
     '''
     An enum used for the charging profile type in the `SetChargingProfile`
     '''
@@ -116,7 +157,7 @@ class ChargingProfileKindType(Enum):
     Recurring   = "Recurring"   # The schedule restarts periodically at the first schedule period.
     Relative    = "Relative"    # Schedule periods are relative to a situation- specific start point (such as the start of a session) that is determined by the charge point.
 
-class RecurrencyKindType(Enum):
+class RecurrencyKindType(OcppEnum):
     '''
     An enum used for the recurrency of the charging profile
     '''
@@ -124,7 +165,7 @@ class RecurrencyKindType(Enum):
     Daily       = "Daily"       # The schedule restarts at the beginning of the next day.
     Weekly      = "Weekly"      # The schedule restarts at the beginning of the next week (defined as Monday morning)
 
-class AvailabilityType(Enum):
+class AvailabilityType(OcppEnum):
     '''
     An enum used for the type of the availability of the chargers
     '''
@@ -132,7 +173,7 @@ class AvailabilityType(Enum):
     Inoperative = "Inoperative" # Charge point is not available for charging.
     Operative   = "Operative"   # Charge point is available for charging.
 
-class MessageTrigger(Enum):
+class MessageTrigger(OcppEnum):
     '''
     An enum used to trigger messages from the chargers.
     '''
@@ -144,7 +185,7 @@ class MessageTrigger(Enum):
     MeterValues                     = "MeterValues"                     # To trigger a MeterValues request
     StatusNotification              = "StatusNotification"              # To trigger a StatusNotification request
 
-class ResetType(Enum): 
+class ResetType(OcppEnum): 
     '''
     An enum type describing the type of reset that should be made
     '''
@@ -152,7 +193,7 @@ class ResetType(Enum):
     Hard    = "Hard"    # Full reboot of Charge Point software.
     Soft    = "Soft"    # Return to initial status, gracefully terminating any transactions in progress.
 
-class UpdateType(Enum):
+class UpdateType(OcppEnum):
     '''
     An enum used for the type of the update sent in the `SetLocalList` requests
     '''
@@ -160,7 +201,7 @@ class UpdateType(Enum):
     Differential    = "Differential"    # Indicates that the current Local Authorization List must be updated with the values in this message.
     Full            = "Full"            # Indicates that the current Local Authorization List must be replaced by the values in this message.
 
-class DataTransferStatus(Enum):
+class DataTransferStatus(OcppEnum):
     '''
     An enum used to describe the status of data transfer.
     '''
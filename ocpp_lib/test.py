@@ -1,8 +1,13 @@
-from ocpp_lib.call import Call
 from ocpp_lib.types import RemoteStartTransaction_Req, IdToken
-import asyncio
+from ocpp_lib.enums import OCPPMessageType
+from ocpp_lib import utils
+import asyncio, sys, timeit
 
 async def main():
+    # The call handler uses the Django models, so it is only imported when a command
+    # is actually issued. The benchmark below does not need Django to be set up
+    from ocpp_lib.call import Call
+
     response = await Call.CallHandler.issue_command(
         charger_id = "ESP32_Charger",
         request = RemoteStartTransaction_Req(
@@ -14,4 +19,37 @@ async def main():
         shouldAwait = True
     )
 
-asyncio.run(main)
\ No newline at end of file
+def benchmark(number:int = 10000, repeat:int = 5) -> None:
+    '''
+    Times the encoding done by `issue_command` without sending anything
+
+    ## Description
+    Creates the same request as `main`, builds its OCPP call message and serializes 
+    it to JSON. The charger, the channel layer and the database are not used so 
+    that only the encoding is measured.
+
+    ## Parameters
+    - `number` (int): The number of messages encoded in each timing run
+    - `repeat` (int): The number of timing runs
+    '''
+    def encode() -> str:
+        request = RemoteStartTransaction_Req(
+            idTag = IdToken(
+                IdToken = "ep2033mddow2",
+            ),
+            connectorId = 1
+        )
+        return utils.json_dumps([
+            OCPPMessageType.CALL.value,
+            utils.random_message_id(),
+            'RemoteStartTransaction',
+            request.serialize()
+        ])
+
+    timings = timeit.repeat(encode, number = number, repeat = repeat)
+    print(f"Encoding a RemoteStartTransaction call took {min(timings) / number * 1e6:.2f} us at best over {repeat} runs")
+
+if 'benchmark' in sys.argv[1:]:
+    benchmark()
+else:
+    asyncio.run(main())
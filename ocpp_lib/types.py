@@ -10,14 +10,282 @@
 # Date: 12-Jun-2021                                 #
 # ------------------------------------------------- #
 
-from typing import Any, Union, List
-from .enums import AuthorizationStatus, AvailabilityType, ChargingProfileKindType, ChargingProfilePurposeType, ChargingRateUnitType, DataTransferStatus, MessageTrigger, RegistrationStatus, RemoteStartStopStatus, RecurrencyKindType, UpdateType
-import datetime, json, enum
+from typing import Any, Union, List, get_origin
+from .enums import OCPPCommands, AuthorizationStatus, AvailabilityType, ChargingProfileKindType, ChargingProfilePurposeType, ChargingRateUnitType, DataTransferStatus, MessageTrigger, RegistrationStatus, RemoteStartStopStatus, RecurrencyKindType, UpdateType
+from .utils import json_dumps
+import datetime, enum, operator, inspect, functools
 
 # If the doc strings are too much, use the 
 # regex '''[\w\W]*?''' to remove it :)
 
-class OcppType():
+def _identity(value:Any) -> Any:
+    '''
+    Returns the value as it is. Used for the values which are already JSON serializable
+    '''
+    return value
+
+@functools.lru_cache(maxsize = 1024)
+def _cached_isoformat(value:datetime.datetime, tzinfo:datetime.tzinfo, fold:int) -> str:
+    '''
+    Converts a date time object to its ISO format. The time zone and the fold are a
+    part of the key of the cache since date times in different time zones which refer
+    to the same moment are equal to each other but have different ISO formats
+    '''
+    return value.isoformat()
+
+def _serialize_datetime(value:datetime.datetime) -> str:
+    '''
+    Serializes a date time object to its ISO format
+
+    ## Description
+    Converting a date time with a time zone to its ISO format is slow, and the same date
+    times are often serialized many times such as the expiry dates of the authorization
+    data in a local list. The ISO formats of the most recently serialized date times are
+    cached for this reason.
+    '''
+    return _cached_isoformat(value, value.tzinfo, value.fold)
+
+def _serialize_list(value:list) -> list:
+    '''
+    Serializes each one of the items in a list
+
+    ## Description
+    The function used to serialize each item is looked up in `_SERIALIZERS` directly
+    instead of calling `_serialize_value` for every item.
+    '''
+    find_serializer = _SERIALIZERS.get
+    return [(find_serializer(type(one)) or _find_serializer(type(one)))(one) for one in value]
+
+# The functions used to serialize the values keyed by the exact type of the value. 
+# The OcppType classes are added when they're defined and the other types which 
+# are not found in here are added the first time a value of their type is serialized
+_SERIALIZERS = {
+    int: _identity,
+    float: _identity,
+    bool: _identity,
+    str: _identity,
+    datetime.datetime: _serialize_datetime,
+    datetime.date: datetime.date.isoformat,
+    list: _serialize_list,
+}
+
+# The types which are checked together when finding the serializer of a type. The 
+# bool type is a subclass of int so it does not need to be included
+_DATE_TYPES = (datetime.datetime, datetime.date)
+_PRIMITIVE_TYPES = (int, float, str)
+
+def _find_serializer(value_type:type):
+    '''
+    Finds the function used to serialize the values of the given type
+
+    ## Description
+    This is used for the types which are not already in `_SERIALIZERS` such as the
+    enums and the OcppType classes. The function found is added to `_SERIALIZERS` so
+    that the type only needs to be checked once.
+
+    ## Parameters
+    - `value_type` (type): The type of the value being serialized
+
+    ## Returns
+    - `Callable`: The function used to serialize the values of this type
+
+    ## Raises
+    - `ValueError`: If the type does not have any known serialization methods
+    '''
+    # If the value is an Enum. The value of the member is read from its `_value_` 
+    # attribute since `value` is a property which is much slower to look up
+    if issubclass(value_type, enum.Enum):
+        serializer = operator.attrgetter('_value_')
+
+    # If the value if a date time object
+    elif issubclass(value_type, _DATE_TYPES):
+        serializer = value_type.isoformat
+
+    # If the object is a subclass of OcppType
+    elif issubclass(value_type, OcppType):
+        serializer = operator.methodcaller('serialize')
+
+    # If the object is already of an acceptable data type
+    elif issubclass(value_type, _PRIMITIVE_TYPES):
+        serializer = _identity
+
+    # If we find that the item is a list, then we serialize each of them
+    elif issubclass(value_type, list):
+        serializer = _serialize_list
+
+    # If none of the above is the case then we dont know how to serialize this
+    else:
+        raise ValueError(f"An object of the type `{value_type}` does not have any known serialization methods")
+
+    _SERIALIZERS[value_type] = serializer
+    return serializer
+
+def _serialize_value(value:Any) -> Union[str,dict,int,float,list]:
+    '''
+    Serializes a single value to its correct object type
+
+    ## Description
+    The function used to serialize the value is found using the exact type of the value 
+    so that only a single dictionary lookup is needed for most values.
+
+    ## Returns
+    - `Any`: An object of any type
+    '''
+    serializer = _SERIALIZERS.get(type(value))
+    if serializer is None:
+        serializer = _find_serializer(type(value))
+    return serializer(value)
+
+def _field_serializer_source(name:str, annotation:Any) -> str:
+    '''
+    Creates the source code of the expression which serializes a single field
+
+    ## Description
+    The expression is picked using the annotation of the field in the constructor. Since
+    the annotation is only a hint of what is passed to the constructor, the expression 
+    checks that the value is of the annotated type and otherwise falls back to serializing
+    the value using `_serialize_value`.
+
+    ## Parameters
+    - `name` (str): The name of the field
+    - `annotation` (Any): The annotation of the field in the constructor of the class
+
+    ## Returns
+    - `str`: The source code of the expression which serializes the `value` of the field
+    '''
+    # If the field is a list, then we serialize each of its items
+    if annotation is list or get_origin(annotation) is list:
+        return "_serialize_list(value) if type(value) is list else _serialize_value(value)"
+
+    if not isinstance(annotation, type):
+        return "_serialize_value(value)"
+
+    # If the field is an Enum
+    if issubclass(annotation, enum.Enum):
+        expression = "value._value_"
+
+    # If the field is a date time object
+    elif annotation is datetime.datetime:
+        expression = "_serialize_datetime(value)"
+    elif annotation is datetime.date:
+        expression = "value.isoformat()"
+
+    # If the field is a subclass of OcppType
+    elif issubclass(annotation, OcppType):
+        expression = "value.serialize()"
+
+    # If the field is already of an acceptable data type
+    elif annotation in (int, float, bool, str):
+        expression = "value"
+
+    else:
+        return "_serialize_value(value)"
+
+    return f"{expression} if type(value) is _type_of_{name} else _serialize_value(value)"
+
+def _make_serializer(cls:type):
+    '''
+    Creates the `serialize` method of an OcppType class
+
+    ## Description
+    The fields of a class and their types are known once the class is defined. This 
+    function uses them to create a `serialize` method which goes over each one of the
+    fields directly instead of finding how to serialize each value when it's called.
+
+    Classes whose fields are all required and of a primitive type, such as `IdToken` or
+    the classes without any fields, get a `serialize` method which returns the fields in
+    a single dictionary. If any of the fields is not of its annotated type, the method
+    falls back to `OcppType.serialize`.
+
+    ## Parameters
+    - `cls` (type): The OcppType class to create the `serialize` method for
+
+    ## Returns
+    - `Callable`: The `serialize` method of the class
+    '''
+    parameters = inspect.signature(cls.__init__).parameters
+    namespace = {'_serialize_value': _serialize_value, '_serialize_list': _serialize_list, '_serialize_datetime': _serialize_datetime, '_serialize_fields': OcppType.serialize}
+
+    annotations = {name: parameters[name].annotation if name in parameters else inspect.Parameter.empty for name in cls.__ocpp_fields__}
+    for name, annotation in annotations.items():
+        namespace[f'_type_of_{name}'] = annotation
+
+    is_leaf = all(annotation in (int, float, bool, str) and parameters[name].default is inspect.Parameter.empty for name, annotation in annotations.items())
+
+    lines = ["def serialize(self):"]
+    if is_leaf:
+        lines.extend(f"    value_{index} = self.{name}" for index, name in enumerate(annotations))
+        checks = ' and '.join(f"type(value_{index}) is _type_of_{name}" for index, name in enumerate(annotations))
+        items = ', '.join(f"{name!r}: value_{index}" for index, name in enumerate(annotations))
+        if checks:
+            lines.append(f"    if {checks}:")
+            lines.append(f"        return {{{items}}}")
+            lines.append("    return _serialize_fields(self)")
+        else:
+            lines.append("    return {}")
+    else:
+        lines.append("    serialized = {}")
+        for name, annotation in annotations.items():
+            lines.append(f"    value = self.{name}")
+            lines.append("    if value is not None:")
+            lines.append(f"        serialized[{name!r}] = {_field_serializer_source(name, annotation)}")
+        lines.append("    return serialized")
+
+    exec(compile('\n'.join(lines), f'<{cls.__qualname__}.serialize>', 'exec'), namespace)
+
+    serialize = namespace['serialize']
+    serialize.__qualname__ = f'{cls.__qualname__}.serialize'
+    serialize.__doc__ = OcppType.serialize.__doc__
+    serialize.__ocpp_generated__ = True
+    return serialize
+
+# The kinds of the parameters which take any number of arguments. These are not fields
+# of the OcppType classes
+_VARIADIC_PARAMETERS = (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)
+
+class OcppTypeMeta(type):
+    '''
+    The metaclass of the OcppType classes
+
+    ## Description
+    Creates the `serialize` method of each one of the OcppType classes when the class is
+    defined. Classes which define their own `serialize` method, or inherit one which was
+    not created here, are left as is. The `serialize` method of the class is then added to `_SERIALIZERS` so that the objects
+    of the class are serialized without having to find their serializer first.
+
+    The fields of the classes are stored in slots instead of a `__dict__`. Unless a class
+    declares its own `__slots__`, it is given a slot for each one of the named parameters
+    of its constructor which its parents do not already have a slot for. Classes whose
+    constructor takes its fields as keyword arguments, such as the subclasses which use
+    the constructor of `OcppType`, keep their fields in a `__dict__` instead and are 
+    serialized by `OcppType.serialize`.
+    '''
+
+    def __new__(mcs, name:str, bases:tuple, namespace:dict, **kwargs:dict):
+        if '__slots__' not in namespace:
+            inherited_slots = {slot for base in bases for parent in base.__mro__ for slot in getattr(parent, '__slots__', ())}
+            constructor = namespace.get('__init__', bases[0].__init__ if bases else None)
+            parameters = tuple(inspect.signature(constructor).parameters.values())[1:] if constructor is not None else ()
+
+            slots = [parameter.name for parameter in parameters if parameter.kind not in _VARIADIC_PARAMETERS and parameter.name not in inherited_slots]
+            if any(parameter.kind is inspect.Parameter.VAR_KEYWORD for parameter in parameters) and all(base.__dictoffset__ == 0 for base in bases):
+                slots.append('__dict__')
+            namespace['__slots__'] = tuple(slots)
+
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+    def __init__(cls, name:str, bases:tuple, namespace:dict, **kwargs:dict):
+        super().__init__(name, bases, namespace, **kwargs)
+
+        # The inherited `serialize` method is only replaced if it is the one of OcppType or
+        # was created for a parent, since those only go over the fields of the parent
+        inherited = cls.serialize
+        if 'serialize' not in namespace and (inherited is OcppType.serialize or getattr(inherited, '__ocpp_generated__', False)):
+            cls.serialize = _make_serializer(cls) if cls.__dictoffset__ == 0 else OcppType.serialize
+
+        _SERIALIZERS[cls] = cls.serialize
+
+class OcppType(metaclass = OcppTypeMeta):
     '''
     A parent class used to define an OCPP Type. 
 
@@ -26,80 +294,103 @@ class OcppType():
     by default. In most cases these types are JSON serializeable objects
     '''
 
+    # The OCPP action of the request classes, set when they're defined
+    __ocpp_action__ = None
+
+    # The fields are stored in the slots of the subclasses
+    __slots__ = ()
+
+    # The request classes and their OCPP actions. Classes are added to it when
+    # they're defined
+    _registry = {}
+
+    # The names of the fields of the class in the order of its constructor's
+    # parameters, set when the class is defined
+    __ocpp_fields__ = ()
+
     def __init__(self, *args:list, **kwargs:dict):
         '''
         The main constructor to the OcppType class
 
         ## Description
-        This constructor takes in a data variable and assigns it to the `self.__data`.
-        This variable is what we use for the serialization of the data
+        This constructor takes in the fields of the object as keyword arguments and
+        stores each one of them as an attribute of the object. The fields are what we 
+        use for the serialization of the data
+
+        The subclasses which use this constructor keep their fields in a `__dict__`. The
+        `OcppType` class itself has no `__dict__` so that its subclasses can store their
+        fields in slots, which means that it can not be given any fields on its own.
 
         ## Parameters
-        - `data` (dict): A dictionary of the data which we will serialize. This data is often
-        the kwargs argument. In this case, all `None` values will be removed from it
+        - `kwargs` (dict): The fields of the object keyed by their names. This is often
+        all of the arguments passed to the constructor of the subclass
         '''
-        self.__data = {key:value for key,value in kwargs.items() if value != None}
+        for key, value in kwargs.items():
+            setattr(self, key, value)
 
-    def serialize(self) -> dict:
+    def __init_subclass__(cls, **kwargs:dict):
         '''
-        A method used to serialize the OCPP object.
+        Sets the OCPP action of the classes which inherit from the OcppType class
 
         ## Description
-        This method performs serialization on the `data` argument passed to the class 
-        constructor. 
+        The action name of a request is found once when its class is defined instead of 
+        every time that the request is issued. The request classes are those defined in
+        this file which are named `<Action>_Req` where `<Action>` is a valid OCPP command. 
+        The `__ocpp_action__` of any other class is `None` which means that it can not be 
+        issued as a request. The request classes are also added to the `_registry`.
 
-        ## Returns
-        - `dict`: A dict of the serialized data
+        The `__ocpp_fields__` of the class are the parameters of its constructor.
         '''
-        def single_value_serialize(value:Any) -> Union[str,dict,int,float]:
-            '''
-            Serializes a single value to its correct object type
+        super().__init_subclass__(**kwargs)
 
-            ## Description
-            A method used to convert an object of any type to its correct type. This method
-            is an internal method which is only accessible within the `serialize` function.
+        if '__init__' in cls.__dict__:
+            parameters = tuple(inspect.signature(cls.__init__).parameters.values())[1:]
+            cls.__ocpp_fields__ = tuple(parameter.name for parameter in parameters if parameter.kind not in _VARIADIC_PARAMETERS)
 
-            ## Retuens
-            - `Any`: An object of any type
-            '''
-            
-            # If the value is an Enum
-            if isinstance(value, enum.Enum):
-                return value.value
+        action, _, kind = cls.__name__.partition('_')
+        is_request = cls.__module__ == __name__ and kind == 'Req' and action in OCPPCommands.__members__
+        cls.__ocpp_action__ = action if is_request else None
 
-            # If the value if a date time object
-            elif isinstance(value, datetime.datetime) or isinstance(value, datetime.date):
-                return value.isoformat()
+        if is_request:
+            OcppType._registry[cls] = action
 
-            # If the object is a subclass of OcppType
-            elif issubclass(value.__class__, OcppType):
-                return value.serialize()
+    def serialize(self) -> dict:
+        '''
+        A method used to serialize the OCPP object.
 
-            # If the object is already of an acceptable data type
-            elif isinstance(value, int) or isinstance(value, float) or isinstance(value, bool) or isinstance(value, str):
-                return value 
-            
-            # If we find that the item is a list, then we serialize each of them
-            elif isinstance(value, list):
-                value = [one.serialize() if issubclass(value.__class__, OcppType) else one for one in list]
+        ## Description
+        This method performs serialization on the fields of the object, including the
+        fields passed as keyword arguments to a constructor which takes them. The fields 
+        which are `None` are left out.
 
-            # If none of the above is the case then we dont know how to serialize this
-            else:
-                raise ValueError(f"An object of the type `{type(value)}` and the class `{value.__class__}` does not have any known serialization methods")
+        ## Returns
+        - `dict`: A dict of the serialized data
+        '''
+        serialized = {}
+        for name in self.__ocpp_fields__:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            serialized[name] = _serialize_value(value)
 
-        return {key:single_value_serialize(value) for key,value in self.__data.items()}
+        for name, value in getattr(self, '__dict__', {}).items():
+            if value is None:
+                continue
+            serialized[name] = _serialize_value(value)
+        return serialized
 
     def __str__(self) -> str:
         '''
         Converts the data to a JSON String
 
         ## Description
-        A method used to convert the data passed to the constructor to a JSON string
+        A method used to convert the data passed to the constructor to a JSON string. The 
+        string is created using orjson when it is available.
 
         ## Returns
         - `str`: A string of the serialized data
         '''
-        return json.dumps(self.serialize())
+        return json_dumps(self.serialize())
 
     def __repr__(self) -> str:
         '''
@@ -135,8 +426,7 @@ class IdToken(OcppType):
         - `IdToken` (str): Required. Required. IdToken is case insensitive.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.IdToken = IdToken
 
 class IdTagInfo(OcppType):
     '''
@@ -160,8 +450,9 @@ class IdTagInfo(OcppType):
         idTag should be removed from the Authorization Cache.
         '''
         
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.status = status
+        self.parentIdTag = parentIdTag
+        self.expiryDate = expiryDate
 
 class ChargingSchedulePeriod(OcppType):
     '''
@@ -186,8 +477,9 @@ class ChargingSchedulePeriod(OcppType):
         If a number of phases is needed, numberPhases=3 will be assumed unless another number is given.
         '''
         
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.startPeriod = startPeriod
+        self.limit = limit
+        self.numberPhases = numberPhases
 
 class ChargingSchedule(OcppType):
     '''
@@ -223,8 +515,11 @@ class ChargingSchedule(OcppType):
         # Casting it to a list if its not 
         chargingSchedulePeriod = chargingSchedulePeriod if isinstance(chargingSchedulePeriod, list) else [chargingSchedulePeriod]
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.chargingRateUnit = chargingRateUnit
+        self.chargingSchedulePeriod = chargingSchedulePeriod
+        self.duration = duration
+        self.startSchedule = startSchedule
+        self.minChargingRate = minChargingRate
 
 class ChargingProfile(OcppType):
     '''
@@ -260,8 +555,15 @@ class ChargingProfile(OcppType):
         `ChargingProfilePurpose` is TxProfile.
         '''
         
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.chargingProfileId = chargingProfileId
+        self.stackLevel = stackLevel
+        self.chargingProfilePurpose = chargingProfilePurpose
+        self.chargingProfileKind = chargingProfileKind
+        self.chargingSchedule = chargingSchedule
+        self.transactionId = transactionId
+        self.recurrencyKind = recurrencyKind
+        self.validFrom = validFrom
+        self.validTo = validTo
 
 class AuthorizationData(OcppType):
     '''
@@ -283,8 +585,8 @@ class AuthorizationData(OcppType):
         If this element is absent, than the entry for this idtag in the Local Authorization List SHALL be deleted.
         '''
         
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.idTag = idTag
+        self.idTagInfo = idTagInfo
 
 # ------------------------------------------------------
 # More complex return types which will be used as the 
@@ -309,8 +611,7 @@ class Authorize_Conf(OcppType):
         status, expiry and parent id.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.idTagInfo = idTagInfo
 
 class BootNotification_Conf(OcppType):
     '''
@@ -336,8 +637,9 @@ class BootNotification_Conf(OcppType):
         registered within the System Central.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.currentTime = currentTime
+        self.interval = interval
+        self.status = status
 
 class StatusNotification_Conf(OcppType):
     '''
@@ -353,9 +655,6 @@ class StatusNotification_Conf(OcppType):
         to the Charge Point in response to an StatusNotification.req PDU
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
-
 class StartTransaction_Conf(OcppType):
     '''
     A class which describes the `StartTransaction.conf` datatype in the OCPP documentation
@@ -376,8 +675,8 @@ class StartTransaction_Conf(OcppType):
         Central System.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.idTagInfo = idTagInfo
+        self.transactionId = transactionId
 
 class StopTransaction_Conf(OcppType):
     '''
@@ -397,8 +696,7 @@ class StopTransaction_Conf(OcppType):
         status, expiry and parent id.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.idTagInfo = idTagInfo
 
 class MeterValues_Conf(OcppType):
     '''
@@ -414,9 +712,6 @@ class MeterValues_Conf(OcppType):
         to the Charge Point in response to an MeterValues.req PDU
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
-
 class Heartbeat_Conf(OcppType):
     '''
     A class which describes the `Heartbeat.conf` datatype in the OCPP documentation
@@ -435,8 +730,7 @@ class Heartbeat_Conf(OcppType):
         System.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.currentTime = currentTime
 
 class DataTransfer_Conf(OcppType):
     '''
@@ -457,8 +751,8 @@ class DataTransfer_Conf(OcppType):
         - `data` (str): Optional. Data in response to request.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.status = status
+        self.data = data
 
 class DiagnosticsStatusNotification_Conf(OcppType):
     '''
@@ -474,9 +768,6 @@ class DiagnosticsStatusNotification_Conf(OcppType):
         Central System to the Charge Point in response to an DiagnosticsStatusNotification.req PDU
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
-
 class  FirmwareStatusNotification_Conf(OcppType):
     '''
     A class which describes the ` FirmwareStatusNotification.conf` datatype in the OCPP documentation
@@ -491,9 +782,6 @@ class  FirmwareStatusNotification_Conf(OcppType):
         Central System to the Charge Point in response to an  FirmwareStatusNotification.req PDU
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
-
 class RemoteStartTransaction_Req(OcppType):
     '''
     A class which describes the `RemoteStartTransaction.Req` datatype in the OCPP documentation
@@ -515,8 +803,9 @@ class RemoteStartTransaction_Req(OcppType):
         connectorId SHALL be > 0
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.idTag = idTag
+        self.chargingProfile = chargingProfile
+        self.connectorId = connectorId
 
 class RemoteStopTransaction_Req(OcppType):
     '''
@@ -536,8 +825,7 @@ class RemoteStopTransaction_Req(OcppType):
         requested to stop.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.transactionId = transactionId
 
 class GetLocalListVersion_Req(OcppType):
     '''
@@ -557,8 +845,7 @@ class GetLocalListVersion_Req(OcppType):
         authorization list in the Charge Point.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.transactionId = transactionId
 
 class ReserveNow_Req(OcppType):
     '''
@@ -584,8 +871,11 @@ class ReserveNow_Req(OcppType):
         - `reservationId` (int): Required. Unique id for this reservation.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.connectorId = connectorId
+        self.expiryDate = expiryDate
+        self.idTag = idTag
+        self.reservationId = reservationId
+        self.parentIdTag = parentIdTag
 
 class CancelReservation_Req(OcppType):
     '''
@@ -604,8 +894,7 @@ class CancelReservation_Req(OcppType):
         - `reservationId` (int): Required. Unique id for this reservation.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.reservationId = reservationId
 
 class ChangeAvailability_Req(OcppType):
     '''
@@ -628,8 +917,8 @@ class ChangeAvailability_Req(OcppType):
         the Charge Point should perform.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.connectorId = connectorId
+        self.type = type
 
 class ChangeConfiguration_Req(OcppType):
     '''
@@ -651,8 +940,8 @@ class ChangeConfiguration_Req(OcppType):
         configuration key names and associated values
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.key = key
+        self.value = value
 
 class ClearChargingProfile_Req(OcppType):
     '''
@@ -679,8 +968,10 @@ class ClearChargingProfile_Req(OcppType):
         cleared, if they meet the other criteria in the request
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.id = id
+        self.connectorId = connectorId
+        self.chargingProfilePurpose = chargingProfilePurpose
+        self.stackLevel = stackLevel
 
 class ClearCache_Req(OcppType):
     '''
@@ -696,9 +987,6 @@ class ClearCache_Req(OcppType):
         System to the Charge Point.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
-
 class DataTransfer_Req(OcppType):
     '''
     A class which describes the `DataTransfer.Req` datatype in the OCPP documentation
@@ -718,8 +1006,9 @@ class DataTransfer_Req(OcppType):
         - `data` (str): Optional. Data without specified length or format.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.vendorId = vendorId
+        self.messageId = messageId
+        self.data = data
 
 class SetChargingProfile_Req(OcppType):
     '''
@@ -741,8 +1030,8 @@ class SetChargingProfile_Req(OcppType):
         the Charge Point.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.connectorId = connectorId
+        self.csChargingProfiles = csChargingProfiles
 
 class TriggerMessage_Req(OcppType):
     '''
@@ -764,8 +1053,8 @@ class TriggerMessage_Req(OcppType):
         connector.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.requestedMessage = requestedMessage
+        self.connectorId = connectorId
 
 class UpdateFirmware_Req(OcppType):
     '''
@@ -793,8 +1082,10 @@ class UpdateFirmware_Req(OcppType):
          to wait between attempts.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.location = location
+        self.retrieveDate = retrieveDate
+        self.retries = retries
+        self.retryInterval = retryInterval
 
 class UnlockConnector_Req(OcppType):
     '''
@@ -814,8 +1105,7 @@ class UnlockConnector_Req(OcppType):
         unlocked.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.connectorId = connectorId
 
 class GetCompositeSchedule_Req(OcppType):
     '''
@@ -838,8 +1128,9 @@ class GetCompositeSchedule_Req(OcppType):
         - `chargingRateUnit` (ChargingRateUnitType): Optional. Can be used to force a power or current profile
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.connectorId = connectorId
+        self.duration = duration
+        self.chargingRateUnit = chargingRateUnit
 
 class GetConfiguration_Req(OcppType):
     '''
@@ -858,12 +1149,12 @@ class GetConfiguration_Req(OcppType):
         - `key` (str): Required. Optional. List of keys for which the configuration value is requested.
         '''
 
-        # Checking if the chargingSchedulePeriod is a list or not. 
-        # Casting it to a list if its not 
-        key = key if isinstance(key, list) else [key]
+        # Checking if the key is a list or not. Casting it to a list if its not. When
+        # no key is given it is left out so that the charger returns all of its keys
+        if key is not None and not isinstance(key, list):
+            key = [key]
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.key = key
 
 class GetDiagnostics_Req(OcppType):
     '''
@@ -892,8 +1183,11 @@ class GetDiagnostics_Req(OcppType):
         information to include in the diagnostics.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
+        self.location = location
+        self.retries = retries
+        self.retryInterval = retryInterval
+        self.startTime = startTime
+        self.stopTime = stopTime
 
 class SendLocalList_Req(OcppType):
     '''
@@ -921,5 +1215,6 @@ class SendLocalList_Req(OcppType):
         of this request.
         '''
 
-        accepted_args = {dictKey:dictValue for dictKey,dictValue in locals().items() if dictKey != 'self'}
-        OcppType.__init__(self, **accepted_args)
\ No newline at end of file
+        self.listVersion = listVersion
+        self.localAuthorizationList = localAuthorizationList
+        self.updateType = updateType
\ No newline at end of file
@@ -6,7 +6,60 @@
 # Date: 12-Jun-2021                                 #
 # ------------------------------------------------- #
 
-import random, string
+import os, string, json, collections, datetime
+
+# orjson is a C implementation of JSON which is a lot faster than the json
+# module for the small payloads found in OCPP. It's optional, so we fall
+# back to the standard library when it's not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Deserializes a JSON document given as a `str` or as `bytes`
+json_loads = orjson.loads if orjson is not None else json.loads
+
+# A table which maps each random byte to one of the letters and digits used in
+# the message ids. Each character is mapped to by 4 of the first 248 bytes, and
+# the remaining 8 bytes are removed so that all of the characters are equally likely
+_MESSAGE_ID_ALPHABET = (string.ascii_letters + string.digits).encode('ascii')
+_MESSAGE_ID_TABLE = bytes(_MESSAGE_ID_ALPHABET[byte % len(_MESSAGE_ID_ALPHABET)] for byte in range(256))
+_MESSAGE_ID_REJECTED = bytes(range(4 * len(_MESSAGE_ID_ALPHABET), 256))
+
+# A pool of message ids of the default length which are created in batches. This
+# way the cost of creating them is shared between all of the ids in a batch
+_MESSAGE_ID_LENGTH = 16
+_MESSAGE_ID_POOL_SIZE = 1024
+_message_id_pool = collections.deque()
+
+# A forked process would otherwise hand out the same ids from its copy of the pool 
+# as its parent, so the pool is emptied in the child and then refilled on its own
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child = _message_id_pool.clear)
+
+def _create_message_ids(length:int, count:int) -> list:
+    '''
+    Creates a number of random message IDs of the given length and returns them.
+
+    The characters of the ids are created by translating a block of random bytes
+    using `_MESSAGE_ID_TABLE`, which also removes the bytes that would make some of
+    the characters more likely than others. All of the ids are created from a single
+    block of random bytes.
+
+    @param length The length of the random ids to create.
+    @param count The number of random ids to create.
+    @return A list of strings of the random message ids
+    '''
+    needed = length * count
+    characters = b''
+    while len(characters) < needed:
+        # About 1 in 32 of the bytes are removed so a few more are created than needed
+        remaining = needed - len(characters)
+        random_bytes = os.urandom(remaining * 256 // 248 + 16)
+        characters += random_bytes.translate(_MESSAGE_ID_TABLE, _MESSAGE_ID_REJECTED)
+
+    characters = characters.decode('ascii')
+    return [characters[index:index + length] for index in range(0, needed, length)]
 
 def random_message_id(length = 16) -> str:
     '''
@@ -14,9 +67,47 @@ def random_message_id(length = 16) -> str:
 
     A method used to create a random message ID and then return it back to the 
     user. This method has a default length of 16. Note: this method does not 
-    check for conflicts in the message ID. This must be done separately
+    check for conflicts in the message ID. This must be done separately. Ids of
+    the default length are taken from a pool which is refilled when it's empty.
 
     @param length The length of the random id to create.
     @return A string of the random message id
     '''
-    return "".join([random.choice(string.ascii_uppercase + string.ascii_lowercase + string.digits) for _ in range(length)])
\ No newline at end of file
+    if length != _MESSAGE_ID_LENGTH:
+        return _create_message_ids(length, 1)[0]
+
+    # Another thread can take the last id between checking the pool and taking an
+    # id from it, so the pool is refilled whenever taking an id fails instead. Taking
+    # an id from a deque is atomic, so no lock is needed
+    while True:
+        try:
+            return _message_id_pool.popleft()
+        except IndexError:
+            _message_id_pool.extend(_create_message_ids(_MESSAGE_ID_LENGTH, _MESSAGE_ID_POOL_SIZE))
+
+def json_dumps(obj) -> str:
+    '''
+    Serializes an object to a compact JSON string and returns it.
+
+    A method used to serialize the messages sent over the websocket. It uses 
+    orjson when it is available and the standard library json module when 
+    it's not. Both produce the same compact output.
+
+    @param obj The object to serialize.
+    @return A string of the JSON document
+    '''
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators = (',', ':'))
+
+def utc_now() -> datetime.datetime:
+    '''
+    Gets the current time in UTC and returns it.
+
+    A method used to get the current time for the OCPP messages. Unlike the 
+    deprecated `datetime.utcnow()`, the time returned is timezone aware so it
+    is serialized with its UTC offset.
+
+    @return A timezone aware datetime of the current time in UTC
+    '''
+    return datetime.datetime.now(datetime.timezone.utc)